@@ -0,0 +1,167 @@
+import os
+import json
+import numpy as np
+
+# A trace is a directory of flat, headerless NumPy arrays plus a small JSON
+# header. Detections for frame i live in rows offsets[i]:offsets[i + 1].
+# The arrays are append-only so a recorder can flush chunks as it goes.
+TRACE_VERSION = 3
+TRACE_ARRAYS = {
+    'boxes': (np.int32, 4),
+    'confidences': (np.float64, 1),
+    'class_ids': (np.int16, 1),
+    'offsets': (np.int64, 1),
+}
+
+class DetectionRecorder:
+    def __init__(self, trace_path, flush_frames=1000):
+        self.trace_path = trace_path
+        self.flush_frames = flush_frames
+        self.class_names = {}
+        self.frame_count = 0
+        self.detection_count = 0
+        self.reset_buffers()
+
+        # Start a fresh trace; offsets always begin with 0
+        os.makedirs(self.trace_path, exist_ok=True)
+        for name in TRACE_ARRAYS:
+            open(self.array_path(name), 'wb').close()
+        self.offsets.append(0)
+
+    def array_path(self, name):
+        return os.path.join(self.trace_path, f"{name}.bin")
+
+    def reset_buffers(self):
+        self.boxes = []
+        self.confidences = []
+        self.class_ids = []
+        self.offsets = []
+
+    def record(self, detections):
+        """Append the detections of one frame to the trace"""
+        for detection in detections:
+            class_id = int(detection['class_id'])
+            self.boxes.append(detection['bbox'])
+            self.confidences.append(detection['confidence'])
+            self.class_ids.append(class_id)
+            self.class_names[class_id] = detection['class_name']
+
+        self.detection_count += len(detections)
+        self.offsets.append(self.detection_count)
+        self.frame_count += 1
+
+        # Bound memory on long camera runs by flushing in chunks
+        if len(self.offsets) >= self.flush_frames:
+            self.flush()
+
+    def flush(self):
+        """Append buffered frames to the trace files and refresh the header"""
+        buffers = {
+            'boxes': self.boxes,
+            'confidences': self.confidences,
+            'class_ids': self.class_ids,
+            'offsets': self.offsets,
+        }
+        for name, values in buffers.items():
+            dtype, width = TRACE_ARRAYS[name]
+            array = np.asarray(values, dtype=dtype)
+            if width > 1:
+                array = array.reshape(-1, width)
+            with open(self.array_path(name), 'ab') as f:
+                array.tofile(f)
+        self.reset_buffers()
+
+        # The header is rewritten after the data, so a reader never sees
+        # more frames announced than are on disk
+        meta = {
+            'version': TRACE_VERSION,
+            'frames': self.frame_count,
+            'detections': self.detection_count,
+            'class_names': {str(k): v for k, v in sorted(self.class_names.items())}
+        }
+        tmp_path = os.path.join(self.trace_path, 'meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.trace_path, 'meta.json'))
+
+    def save(self):
+        """Flush any remaining frames to disk"""
+        self.flush()
+        print(f"Detection trace saved: {self.trace_path} ({self.frame_count} frames)")
+
+
+class ReplayDetector:
+    """Detector backend that plays back a recorded trace instead of running a model"""
+
+    def __init__(self, trace_path, loop=False):
+        self.trace_path = trace_path
+        self.loop = loop
+        self.position = 0
+
+        with open(os.path.join(trace_path, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        if meta.get('version') != TRACE_VERSION:
+            raise ValueError(f"Unsupported detection trace version: {meta.get('version')}")
+        self.class_names = {int(k): v for k, v in meta['class_names'].items()}
+
+        # Memory-map so replaying a long trace does not load it all up front.
+        # Only the rows covered by the header are used, in case a recorder
+        # is still appending.
+        lengths = {'boxes': meta['detections'], 'confidences': meta['detections'],
+                   'class_ids': meta['detections'], 'offsets': meta['frames'] + 1}
+        for name, (dtype, width) in TRACE_ARRAYS.items():
+            setattr(self, name, self.map_array(name, dtype, width, lengths[name]))
+
+    def map_array(self, name, dtype, width, rows):
+        path = os.path.join(self.trace_path, f"{name}.bin")
+        shape = (rows, width) if width > 1 else (rows,)
+        if rows == 0:
+            # np.memmap cannot map an empty file
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+    @property
+    def frame_count(self):
+        return len(self.offsets) - 1
+
+    def reset(self):
+        """Rewind to the first recorded frame"""
+        self.position = 0
+
+    def detections_for(self, index):
+        """Return the recorded detections of frame `index`"""
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        boxes = self.boxes[start:end].tolist()
+        confidences = self.confidences[start:end].tolist()
+        class_ids = self.class_ids[start:end].tolist()
+
+        return [
+            {
+                'bbox': bbox,
+                'confidence': confidence,
+                'class_id': class_id,
+                'class_name': self.class_names[class_id]
+            }
+            for bbox, confidence, class_id in zip(boxes, confidences, class_ids)
+        ]
+
+    def next_detections(self):
+        """Return the detections of the next frame, or [] once the trace is exhausted"""
+        if self.position >= self.frame_count:
+            if not self.loop or self.frame_count == 0:
+                return []
+            self.position = 0
+
+        detections = self.detections_for(self.position)
+        self.position += 1
+        return detections
+
+    def detect_vehicles(self, frame=None):
+        """VehicleDetector-compatible entry point; the frame is ignored"""
+        return self.next_detections()
+
+    def detect_vehicles_batch(self, frames):
+        return [self.next_detections() for _ in frames]
+
+    # RealHelmetDetector-compatible entry point
+    detect_objects = detect_vehicles
@@ -1,6 +1,4 @@
 import cv2
-import torch
-from ultralytics import YOLO
 from utils.config import Config
 
 class VehicleDetector:
@@ -12,6 +10,9 @@ class VehicleDetector:
     def load_model(self):
         """Load YOLO model for vehicle detection"""
         try:
+            # Imported lazily so replay backends never pull in torch
+            from ultralytics import YOLO
+            
             # This will automatically download YOLOv8n if not present
             self.model = YOLO('yolov8n.pt')
             print("Vehicle detection model loaded successfully")
@@ -29,25 +30,47 @@ class VehicleDetector:
             
             two_wheelers = []
             for result in results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        # class 3: car, 4: motorcycle, 6: bus, 7: truck, etc.
-                        class_id = int(box.cls[0])
-                        confidence = float(box.conf[0])
-                        
-                        # Filter for two-wheelers (motorcycles, bicycles)
-                        if class_id in [1, 2, 3, 4] and confidence > self.config.VEHICLE_CONFIDENCE:  # person, bicycle, car, motorcycle
-                            x1, y1, x2, y2 = map(int, box.xyxy[0])
-                            two_wheelers.append({
-                                'bbox': [x1, y1, x2, y2],
-                                'confidence': confidence,
-                                'class_id': class_id,
-                                'class_name': self.model.names[class_id]
-                            })
+                two_wheelers.extend(self.parse_result(result))
             
             return two_wheelers
             
         except Exception as e:
             print(f"Error in vehicle detection: {e}")
-            return []
\ No newline at end of file
+            return []
+    
+    def detect_vehicles_batch(self, frames):
+        """Detect two-wheelers in a list of frames with a single inference call.
+        
+        Unlike detect_vehicles, failures are raised rather than turned into
+        empty results, so batch callers never record a failed batch as done.
+        """
+        if self.model is None:
+            raise RuntimeError("Vehicle detection model is not loaded")
+        if not frames:
+            return []
+        
+        # YOLO returns one result per input frame, in order
+        results = self.model(frames, verbose=False)
+        return [self.parse_result(result) for result in results]
+    
+    def parse_result(self, result):
+        """Convert a single YOLO result into detection dicts"""
+        two_wheelers = []
+        boxes = result.boxes
+        if boxes is not None:
+            for box in boxes:
+                # class 3: car, 4: motorcycle, 6: bus, 7: truck, etc.
+                class_id = int(box.cls[0])
+                confidence = float(box.conf[0])
+                
+                # Filter for two-wheelers (motorcycles, bicycles)
+                if class_id in [1, 2, 3, 4] and confidence > self.config.VEHICLE_CONFIDENCE:  # person, bicycle, car, motorcycle
+                    x1, y1, x2, y2 = map(int, box.xyxy[0])
+                    two_wheelers.append({
+                        'bbox': [x1, y1, x2, y2],
+                        'confidence': confidence,
+                        'class_id': class_id,
+                        'class_name': self.model.names[class_id]
+                    })
+        
+        return two_wheelers
\ No newline at end of file
@@ -5,38 +5,154 @@ Main entry point for the Helmet Detection System
 
 import argparse
 import cv2
+import glob
+import os
 from processing.video_processor import VideoProcessor
+from processing.image_batch_processor import ImageBatchProcessor
+from processing.job_queue import JobQueue, JobQueueServer, JobWorker, open_queue
+from detection.detection_trace import DetectionRecorder, ReplayDetector
 from utils.config import Config
+from utils.profiler import PipelineProfiler
 
 def main():
     parser = argparse.ArgumentParser(description='Helmet Detection System')
-    parser.add_argument('--input', type=str, required=True, 
-                       help='Input video file path or camera index')
-    parser.add_argument('--output', type=str, default='output_video.mp4',
-                       help='Output video file path')
+    parser.add_argument('--input', type=str, default=None,
+                       help='Input video file path, camera index, or image directory/glob with --images')
+    parser.add_argument('--output', type=str, default=None,
+                       help='Output video file path (JSONL records path with --images)')
     parser.add_argument('--camera', action='store_true',
                        help='Use camera input instead of video file')
+    parser.add_argument('--images', action='store_true',
+                       help='Treat input as a directory or glob of still images')
+    parser.add_argument('--manifest', type=str, default=None,
+                       help='Manifest of already processed images (default: Config.IMAGE_MANIFEST)')
+    parser.add_argument('--batch-size', type=int, default=None,
+                       help='Images per inference batch')
+    parser.add_argument('--decode-threads', type=int, default=None,
+                       help='Threads used to decode images')
+    parser.add_argument('--reduce', type=int, choices=[1, 2, 4, 8], default=None,
+                       help='Decode images at 1/N resolution')
+    parser.add_argument('--record', type=str, default=None,
+                       help='Save per-frame detections to this trace directory')
+    parser.add_argument('--replay', type=str, default=None,
+                       help='Replay detections from a trace directory instead of running the model')
+    parser.add_argument('--profile', type=str, default=None,
+                       help='Write per-stage CPU and allocation profiles to this directory')
+    parser.add_argument('--profile-seconds', type=float, default=None,
+                       help='Stop profiling after this many seconds (default: whole run)')
+    parser.add_argument('--queue', type=str, default=None,
+                       help='Job queue: SQLite file on shared storage or tcp://host:port')
+    parser.add_argument('--enqueue', action='store_true',
+                       help='Add the input video (or glob of videos) to the job queue')
+    parser.add_argument('--segment-frames', type=int, default=None,
+                       help='Frames per queued job, 0 for whole files (default: Config.JOB_SEGMENT_FRAMES)')
+    parser.add_argument('--worker', action='store_true',
+                       help='Process jobs from the job queue')
+    parser.add_argument('--max-jobs', type=int, default=None,
+                       help='Stop the worker after this many jobs')
+    parser.add_argument('--exit-when-idle', action='store_true',
+                       help='Stop the worker once the queue is empty')
+    parser.add_argument('--serve-queue', type=str, default=None, metavar='HOST:PORT',
+                       help='Serve the SQLite job queue over TCP for hosts without shared storage')
     
     args = parser.parse_args()
+    if (args.enqueue or args.worker or args.serve_queue) and not args.queue:
+        parser.error('--enqueue, --worker and --serve-queue require --queue')
+    if not args.input and not (args.camera or args.worker or args.serve_queue):
+        parser.error('--input is required')
     
     # Initialize configuration
     config = Config()
+    if args.batch_size:
+        config.IMAGE_BATCH_SIZE = args.batch_size
+    if args.decode_threads:
+        config.IMAGE_DECODE_THREADS = args.decode_threads
+    if args.reduce:
+        config.IMAGE_REDUCE_FACTOR = args.reduce
     
-    # Initialize video processor
-    processor = VideoProcessor(config)
+    # Optional detector record/replay
+    detector = ReplayDetector(args.replay) if args.replay else None
+    recorder = DetectionRecorder(args.record) if args.record else None
+    
+    # Optional profiling of the pipeline stages
+    profiler = None
+    if args.profile:
+        profiler = PipelineProfiler(args.profile, duration=args.profile_seconds)
     
     try:
-        if args.camera:
+        if args.serve_queue:
+            # Share a local SQLite queue with workers over TCP
+            host, _, port = args.serve_queue.rpartition(':')
+            server = JobQueueServer(JobQueue(args.queue), (host or '0.0.0.0', int(port)))
+            print(f"Serving job queue {args.queue} on {args.serve_queue}")
+            server.serve_forever()
+            return
+        if args.enqueue:
+            enqueue_videos(open_queue(args.queue), args.input, args.segment_frames)
+            return
+        
+        if args.worker:
+            processor = VideoProcessor(config, vehicle_detector=detector, recorder=recorder,
+                                       profiler=profiler)
+            # Results go into the queue's violations table, which the dashboard reads
+            worker = JobWorker(open_queue(args.queue), processor)
+            run = lambda: worker.run(max_jobs=args.max_jobs, exit_when_idle=args.exit_when_idle)
+        elif args.images:
+            # Process a directory or glob of still images
+            processor = ImageBatchProcessor(config, vehicle_detector=detector, recorder=recorder,
+                                            profiler=profiler)
+            run = lambda: processor.process_images(args.input, args.output or 'detections.jsonl',
+                                                   manifest_path=args.manifest,
+                                                   use_manifest=not (args.record or args.replay))
+        elif args.camera:
             # Use camera (default camera index 0)
-            processor.process_camera(camera_index=0, output_path=args.output)
+            processor = VideoProcessor(config, vehicle_detector=detector, recorder=recorder,
+                                       profiler=profiler)
+            run = lambda: processor.process_camera(camera_index=0,
+                                                   output_path=args.output or 'output_video.mp4')
         else:
             # Process video file
-            processor.process_video(args.input, args.output)
+            processor = VideoProcessor(config, vehicle_detector=detector, recorder=recorder,
+                                       profiler=profiler)
+            run = lambda: processor.process_video(args.input, args.output or 'output_video.mp4')
+        
+        # Start profiling once models are loaded, so loading is not sampled
+        if profiler is not None:
+            profiler.start()
+        run()
             
     except KeyboardInterrupt:
         print("\nProcessing interrupted by user")
     except Exception as e:
         print(f"Error during processing: {str(e)}")
+    finally:
+        if recorder is not None:
+            recorder.save()
+        if profiler is not None:
+            profiler.stop()
+
+def enqueue_videos(queue, pattern, segment_frames=None):
+    """Queue every video matching pattern, split into segments of segment_frames"""
+    if segment_frames is None:
+        segment_frames = Config.JOB_SEGMENT_FRAMES
+    
+    paths = sorted(glob.glob(pattern)) or [pattern]
+    total_jobs = 0
+    for path in paths:
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            print(f"Cannot open video, skipping: {path}")
+            continue
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        
+        # Store absolute paths so workers on other hosts see the same file
+        # Segments that are already queued are skipped
+        job_ids = queue.enqueue_segments(os.path.abspath(path), total_frames, segment_frames)
+        total_jobs += len(job_ids)
+        print(f"Queued {path}: {len(job_ids)} new jobs")
+    
+    print(f"Queued {total_jobs} new jobs. Queue status: {queue.status_counts()}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
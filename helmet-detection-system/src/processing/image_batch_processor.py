@@ -0,0 +1,213 @@
+import cv2
+import os
+import glob
+import json
+from datetime import datetime
+from itertools import islice
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from detection.vehicle_detector import VehicleDetector
+from utils.profiler import profile_stage
+
+# JPEG decoders can downscale during decoding, which is much cheaper
+# than decoding at full size and resizing afterwards
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+class ImageBatchProcessor:
+    def __init__(self, config, vehicle_detector=None, recorder=None, profiler=None):
+        self.config = config
+        self.vehicle_detector = vehicle_detector or VehicleDetector(config)
+        self.recorder = recorder
+        self.profiler = profiler
+        self.image_count = 0
+        self.skipped_count = 0
+
+        reduce_factor = self.config.IMAGE_REDUCE_FACTOR
+        if reduce_factor not in REDUCED_DECODE_FLAGS:
+            raise ValueError(f"IMAGE_REDUCE_FACTOR must be one of {sorted(REDUCED_DECODE_FLAGS)}, got {reduce_factor}")
+        self.reduce_factor = reduce_factor
+        self.decode_flag = REDUCED_DECODE_FLAGS[reduce_factor]
+
+    def process_images(self, input_path, output_path, manifest_path=None, use_manifest=True):
+        """Run detection over an image directory or glob, writing one JSONL record per image.
+
+        With use_manifest=False every image is processed and the manifest is
+        left untouched, which record/replay runs need to see the same images.
+        """
+        # Refuse to start rather than mark every image as done with no detections
+        if getattr(self.vehicle_detector, 'model', True) is None:
+            raise RuntimeError("Vehicle detection model is not loaded; not processing images")
+
+        manifest_path = manifest_path or self.config.IMAGE_MANIFEST
+        processed = self.load_manifest(manifest_path) if use_manifest else set()
+
+        print(f"Processing images: {input_path}")
+        if processed:
+            print(f"Skipping images already listed in manifest: {len(processed)}")
+
+        for path in (manifest_path, output_path) if use_manifest else (output_path,):
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        pending = (path for path in self.iter_image_paths(input_path) if path not in processed)
+
+        next_report = 1000
+        manifest_file = open(manifest_path, 'a') if use_manifest else nullcontext()
+        with open(output_path, 'a') as out, manifest_file as manifest:
+            batches = self.iter_decoded_batches(pending)
+            while True:
+                # Time spent here is inference outrunning the decode threads
+                with profile_stage(self.profiler, 'decode_wait'):
+                    batch = next(batches, None)
+                if batch is None:
+                    break
+
+                # Raises on inference failure, before anything is written for the batch
+                self.process_batch(batch, out)
+
+                # Only mark images as done once their records are on disk.
+                # Unreadable images stay out of the manifest so a snapshot
+                # that was still being written is retried on the next run.
+                out.flush()
+                if manifest is not None:
+                    manifest.write(''.join(f"{path}\n" for path, (image, _) in batch if image is not None))
+                    manifest.flush()
+
+                # Display progress
+                if self.image_count >= next_report:
+                    print(f"Processed {self.image_count} images...")
+                    next_report += 1000
+
+        print(f"Processing complete. {self.image_count} images processed, "
+              f"{self.skipped_count} unreadable. Records saved to: {output_path}")
+
+    def process_batch(self, batch, out):
+        """Run batched inference on decoded images and write their records"""
+        frames = [image for _, (image, _) in batch if image is not None]
+        with profile_stage(self.profiler, 'detect'):
+            results = iter(self.vehicle_detector.detect_vehicles_batch(frames))
+
+        records = []
+        for path, (image, original_size) in batch:
+            record = {
+                'image': path,
+                'processed_at': datetime.now().isoformat()
+            }
+
+            if image is None:
+                record['error'] = 'decode_failed'
+                self.skipped_count += 1
+            else:
+                decoded_height, decoded_width = image.shape[:2]
+                if original_size is None:
+                    # Header unreadable: reduced decode rounds up, so this is only approximate
+                    original_size = (decoded_width * self.reduce_factor, decoded_height * self.reduce_factor)
+                    record['size_approximate'] = True
+                width, height = original_size
+
+                record['width'] = width
+                record['height'] = height
+                record['decode_scale'] = self.reduce_factor
+                detections = next(results)
+                if self.recorder is not None:
+                    self.recorder.record(detections)
+                record['detections'] = [
+                    self.scale_detection(d, width / decoded_width, height / decoded_height)
+                    for d in detections
+                ]
+
+            records.append(json.dumps(record) + '\n')
+
+        out.write(''.join(records))
+        self.image_count += len(batch)
+
+    def scale_detection(self, detection, scale_x, scale_y):
+        """Map a detection from decoded-image coordinates back to the original image"""
+        if scale_x == 1 and scale_y == 1:
+            return detection
+
+        x1, y1, x2, y2 = detection['bbox']
+        scaled = dict(detection)
+        scaled['bbox'] = [
+            round(x1 * scale_x),
+            round(y1 * scale_y),
+            round(x2 * scale_x),
+            round(y2 * scale_y),
+        ]
+        return scaled
+
+    def iter_decoded_batches(self, paths):
+        """Yield batches of (path, (image, original_size)) while the next batch decodes in the background"""
+        batch_size = self.config.IMAGE_BATCH_SIZE
+
+        with ThreadPoolExecutor(max_workers=self.config.IMAGE_DECODE_THREADS) as pool:
+            def submit_next():
+                chunk = list(islice(paths, batch_size))
+                return [(path, pool.submit(self.decode_image, path)) for path in chunk]
+
+            upcoming = submit_next()
+            while upcoming:
+                current, upcoming = upcoming, submit_next()
+                yield [(path, future.result()) for path, future in current]
+
+    def decode_image(self, path):
+        """Decode an image, returning (image, original (width, height)); image is None if unreadable"""
+        try:
+            image = cv2.imread(path, self.decode_flag)
+        except Exception as e:
+            print(f"Error decoding image {path}: {e}")
+            return None, None
+
+        if image is None or self.reduce_factor == 1:
+            original_size = None if image is None else (image.shape[1], image.shape[0])
+            return image, original_size
+
+        # Reduced decoding rounds the size up, so take the true size from the header
+        try:
+            with Image.open(path) as header:
+                return image, header.size
+        except Exception:
+            return image, None
+
+    def iter_image_paths(self, input_path):
+        """Lazily yield image paths from a directory tree or a glob pattern"""
+        extensions = tuple(ext.lower() for ext in self.config.IMAGE_EXTENSIONS)
+
+        if os.path.isdir(input_path):
+            paths = self.walk_directory(input_path)
+        else:
+            paths = glob.iglob(input_path, recursive=True)
+
+        for path in paths:
+            if path.lower().endswith(extensions):
+                yield path
+
+    def walk_directory(self, root):
+        """Yield file paths under root without materialising directory listings"""
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file():
+                            yield entry.path
+            except OSError as e:
+                print(f"Error reading directory {directory}: {e}")
+
+    def load_manifest(self, manifest_path):
+        """Load the set of image paths processed by earlier runs"""
+        if not os.path.exists(manifest_path):
+            return set()
+
+        with open(manifest_path, 'r') as f:
+            return {line.rstrip('\n') for line in f if line.strip()}
@@ -0,0 +1,449 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+import socketserver
+from utils.config import Config
+
+# Rollback-journal mode is used on purpose: WAL needs shared memory and is
+# not safe when the database lives on NFS/SMB shared storage.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    video_path TEXT NOT NULL,
+    start_frame INTEGER NOT NULL DEFAULT 0,
+    end_frame INTEGER,
+    status TEXT NOT NULL DEFAULT 'queued',
+    worker_id TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+-- Enqueueing the same segment twice is a no-op; NULL end_frame means "to the end"
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_segment ON jobs (video_path, start_frame, IFNULL(end_frame, -1));
+CREATE TABLE IF NOT EXISTS violations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id INTEGER NOT NULL REFERENCES jobs (id),
+    video_path TEXT NOT NULL,
+    frame INTEGER,
+    camera TEXT,
+    vehicle_type TEXT,
+    confidence REAL,
+    plate_number TEXT,
+    bbox TEXT,
+    recorded REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS violations_job ON violations (job_id);
+"""
+
+JOB_COLUMNS = ('id', 'video_path', 'start_frame', 'end_frame', 'status', 'worker_id',
+               'lease_expires', 'attempts', 'result', 'error')
+
+class JobQueue:
+    """Leased job queue for archived footage, backed by a SQLite file that any host can open"""
+
+    def __init__(self, db_path, lease_seconds=Config.JOB_LEASE_SECONDS,
+                 max_attempts=Config.JOB_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Autocommit mode; every write below opens an explicit transaction
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+    def transaction(self, sql_calls):
+        """Run (sql, params) pairs in one write transaction and return the cursors"""
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                cursors = [self.conn.execute(sql, params) for sql, params in sql_calls]
+                self.conn.execute('COMMIT')
+                return cursors
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def enqueue(self, video_path, start_frame=0, end_frame=None):
+        """Add a job for a whole video or a frame range of it; returns None if already queued"""
+        return self.enqueue_ranges(video_path, [(start_frame, end_frame)])[0]
+
+    def enqueue_segments(self, video_path, total_frames, segment_frames):
+        """Split a video into segments of segment_frames and enqueue them; returns the new job ids"""
+        if not segment_frames or total_frames <= 0:
+            ranges = [(0, None)]
+        else:
+            # The frame count is only an estimate for many containers, so the
+            # last segment is left open-ended rather than cut at total_frames
+            ranges = [(start, start + segment_frames if start + segment_frames < total_frames else None)
+                      for start in range(0, total_frames, segment_frames)]
+
+        return [job_id for job_id in self.enqueue_ranges(video_path, ranges) if job_id is not None]
+
+    def enqueue_ranges(self, video_path, ranges):
+        now = time.time()
+        cursors = self.transaction([(
+            "INSERT OR IGNORE INTO jobs (video_path, start_frame, end_frame, created, updated) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (video_path, start, end, now, now)
+        ) for start, end in ranges])
+        return [cursor.lastrowid if cursor.rowcount == 1 else None for cursor in cursors]
+
+    def lease(self, worker_id):
+        """Claim the oldest queued job for worker_id, or return None if there is nothing to do"""
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                self.requeue_expired_locked(now)
+
+                row = self.conn.execute(
+                    f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    self.conn.execute('COMMIT')
+                    return None
+
+                job = dict(zip(JOB_COLUMNS, row))
+                job.update(status='leased', worker_id=worker_id,
+                           lease_expires=now + self.lease_seconds, attempts=job['attempts'] + 1)
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'leased', worker_id = ?, lease_expires = ?, "
+                    "attempts = ?, updated = ? WHERE id = ?",
+                    (worker_id, job['lease_expires'], job['attempts'], now, job['id'])
+                )
+                self.conn.execute('COMMIT')
+                return job
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def heartbeat(self, job_id, worker_id):
+        """Extend a lease; returns False if the worker no longer holds it"""
+        now = time.time()
+        cursor, = self.transaction([(
+            "UPDATE jobs SET lease_expires = ?, updated = ? "
+            "WHERE id = ? AND worker_id = ? AND status = 'leased'",
+            (now + self.lease_seconds, now, job_id, worker_id)
+        )])
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, violations, result=None):
+        """Store a job's violations and mark it done; returns False if the lease was lost"""
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                row = self.conn.execute(
+                    "SELECT video_path, status FROM jobs WHERE id = ? AND worker_id = ?",
+                    (job_id, worker_id)
+                ).fetchone()
+                if row is not None and row[1] == 'done':
+                    # A retry after a reply was lost; the results are already stored
+                    self.conn.execute('ROLLBACK')
+                    return True
+                if row is None or row[1] != 'leased':
+                    # Lease expired and the job went to another worker; drop these results
+                    self.conn.execute('ROLLBACK')
+                    return False
+
+                self.conn.executemany(
+                    "INSERT INTO violations (job_id, video_path, frame, camera, vehicle_type, "
+                    "confidence, plate_number, bbox, recorded) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(job_id, row[0], v.get('frame'), v.get('camera'), v.get('vehicle_type'),
+                      v.get('confidence'), v.get('plate_number'), json.dumps(v.get('bbox')), now)
+                     for v in violations]
+                )
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'done', lease_expires = NULL, result = ?, updated = ? WHERE id = ?",
+                    (json.dumps(result or {'violations': len(violations)}), now, job_id)
+                )
+                self.conn.execute('COMMIT')
+                return True
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def fail(self, job_id, worker_id, error):
+        """Give a job back after an error; it is retried until max_attempts is reached"""
+        now = time.time()
+        cursor, = self.transaction([(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "worker_id = NULL, lease_expires = NULL, error = ?, updated = ? "
+            "WHERE id = ? AND worker_id = ? AND status = 'leased'",
+            (self.max_attempts, str(error), now, job_id, worker_id)
+        )])
+        return cursor.rowcount == 1
+
+    def requeue_expired(self):
+        """Return jobs whose lease ran out to the queue"""
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                count = self.requeue_expired_locked(time.time())
+                self.conn.execute('COMMIT')
+                return count
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def requeue_expired_locked(self, now):
+        cursor = self.conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "worker_id = NULL, lease_expires = NULL, error = 'lease expired', updated = ? "
+            "WHERE status = 'leased' AND lease_expires < ?",
+            (self.max_attempts, now, now)
+        )
+        return cursor.rowcount
+
+    def status_counts(self):
+        """Return the number of jobs in each status"""
+        with self.lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def violations(self, job_id=None):
+        """Return recorded violations, optionally for a single job"""
+        sql = ("SELECT job_id, video_path, frame, camera, vehicle_type, confidence, plate_number, bbox "
+               "FROM violations")
+        params = ()
+        if job_id is not None:
+            sql += " WHERE job_id = ?"
+            params = (job_id,)
+
+        with self.lock:
+            rows = self.conn.execute(sql + " ORDER BY id", params).fetchall()
+
+        keys = ('job_id', 'video_path', 'frame', 'camera', 'vehicle_type', 'confidence', 'plate_number', 'bbox')
+        records = [dict(zip(keys, row)) for row in rows]
+        for record in records:
+            record['bbox'] = json.loads(record['bbox'])
+        return records
+
+    def violations_since(self, after_id=0, limit=1000):
+        """Return up to limit violations recorded after the violation id after_id, oldest first"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, job_id, camera, vehicle_type, confidence, plate_number, recorded "
+                "FROM violations WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, limit)
+            ).fetchall()
+
+        keys = ('id', 'job_id', 'camera', 'vehicle_type', 'confidence', 'plate_number', 'recorded')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self):
+        self.conn.close()
+
+
+# Methods a RemoteJobQueue may call on the server's JobQueue
+REMOTE_METHODS = ('enqueue', 'enqueue_segments', 'lease', 'heartbeat', 'complete',
+                  'fail', 'requeue_expired', 'status_counts', 'violations', 'violations_since')
+
+class JobQueueServer(socketserver.ThreadingTCPServer):
+    """Serves a local JobQueue over TCP as a stand-in for a shared SQLite file"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, queue, address):
+        self.queue = queue
+        super().__init__(address, JobQueueRequestHandler)
+
+class JobQueueRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # One JSON request per line, one JSON response per line
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                method = request['method']
+                if method not in REMOTE_METHODS:
+                    raise ValueError(f"Unknown method: {method}")
+                response = {'result': getattr(self.server.queue, method)(*request.get('args', []))}
+            except Exception as e:
+                response = {'error': str(e)}
+
+            self.wfile.write((json.dumps(response) + '\n').encode())
+            self.wfile.flush()
+
+class RemoteJobQueue:
+    """Client for JobQueueServer with the same interface as JobQueue"""
+
+    def __init__(self, host, port, timeout=30):
+        self.address = (host, port)
+        self.timeout = timeout
+        self.sock = None
+        self.rfile = None
+        self.lock = threading.Lock()
+
+    def call(self, method, *args):
+        with self.lock:
+            try:
+                if self.sock is None:
+                    self.sock = socket.create_connection(self.address, timeout=self.timeout)
+                    self.rfile = self.sock.makefile('rb')
+                self.sock.sendall((json.dumps({'method': method, 'args': list(args)}) + '\n').encode())
+                line = self.rfile.readline()
+                if not line:
+                    raise ConnectionError("Job queue server closed the connection")
+            except OSError:
+                # A late reply would desynchronise the stream; reconnect on the next call
+                self.close()
+                raise
+
+        response = json.loads(line)
+        if 'error' in response:
+            raise RuntimeError(f"Job queue error: {response['error']}")
+        return response['result']
+
+    def enqueue(self, video_path, start_frame=0, end_frame=None):
+        return self.call('enqueue', video_path, start_frame, end_frame)
+
+    def enqueue_segments(self, video_path, total_frames, segment_frames):
+        return self.call('enqueue_segments', video_path, total_frames, segment_frames)
+
+    def lease(self, worker_id):
+        return self.call('lease', worker_id)
+
+    def heartbeat(self, job_id, worker_id):
+        return self.call('heartbeat', job_id, worker_id)
+
+    def complete(self, job_id, worker_id, violations, result=None):
+        return self.call('complete', job_id, worker_id, violations, result)
+
+    def fail(self, job_id, worker_id, error):
+        return self.call('fail', job_id, worker_id, error)
+
+    def requeue_expired(self):
+        return self.call('requeue_expired')
+
+    def status_counts(self):
+        return self.call('status_counts')
+
+    def violations(self, job_id=None):
+        return self.call('violations', job_id)
+
+    def violations_since(self, after_id=0, limit=1000):
+        return self.call('violations_since', after_id, limit)
+
+    def close(self):
+        if self.sock is not None:
+            self.rfile.close()
+            self.sock.close()
+        self.sock = None
+        self.rfile = None
+
+def open_queue(spec):
+    """Open a queue from 'tcp://host:port' or a SQLite file path"""
+    if spec.startswith('tcp://'):
+        host, _, port = spec[len('tcp://'):].rpartition(':')
+        return RemoteJobQueue(host, int(port))
+    return JobQueue(spec)
+
+
+class JobWorker:
+    """Leases jobs, keeps their leases alive while processing, and reports the results"""
+
+    def __init__(self, queue, processor, worker_id=None,
+                 heartbeat_interval=Config.JOB_HEARTBEAT_INTERVAL,
+                 poll_interval=Config.JOB_POLL_INTERVAL,
+                 max_backoff=Config.JOB_MAX_BACKOFF,
+                 report_attempts=Config.JOB_REPORT_ATTEMPTS):
+        self.queue = queue
+        self.processor = processor
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self.report_attempts = report_attempts
+        self.jobs_done = 0
+
+    def run(self, max_jobs=None, exit_when_idle=False):
+        """Process jobs until interrupted, max_jobs is reached, or the queue is empty"""
+        print(f"Worker {self.worker_id} started")
+
+        while max_jobs is None or self.jobs_done < max_jobs:
+            # Keep retrying: a locked database or a dropped connection is transient
+            job = self.call_queue('lease', self.worker_id)
+            if job is None:
+                if exit_when_idle:
+                    break
+                time.sleep(self.poll_interval)
+                continue
+
+            self.run_job(job)
+
+        print(f"Worker {self.worker_id} finished after {self.jobs_done} jobs")
+
+    def call_queue(self, method, *args, attempts=None):
+        """Call a queue method, backing off on errors; returns None after `attempts` failures"""
+        delay = self.poll_interval
+        failures = 0
+        while True:
+            try:
+                return getattr(self.queue, method)(*args)
+            except Exception as e:
+                failures += 1
+                if attempts is not None and failures >= attempts:
+                    print(f"Job queue {method} failed {failures} times, giving up: {e}")
+                    return None
+                print(f"Job queue {method} failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+
+    def run_job(self, job):
+        end = job['end_frame'] if job['end_frame'] is not None else 'end'
+        print(f"Job {job['id']}: {job['video_path']} frames {job['start_frame']}-{end}")
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self.heartbeat_loop, args=(job['id'], stop), daemon=True)
+        heartbeat.start()
+
+        # The lease stays alive until the outcome has been reported
+        try:
+            try:
+                started = time.time()
+                violations = self.processor.process_segment(job['video_path'], job['start_frame'], job['end_frame'])
+            except Exception as e:
+                print(f"Job {job['id']} failed: {e}")
+                self.call_queue('fail', job['id'], self.worker_id, str(e), attempts=self.report_attempts)
+                return
+
+            result = {
+                'violations': len(violations),
+                'seconds': round(time.time() - started, 2),
+                'worker_id': self.worker_id
+            }
+            completed = self.call_queue('complete', job['id'], self.worker_id, violations, result,
+                                        attempts=self.report_attempts)
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        if completed:
+            self.jobs_done += 1
+            print(f"Job {job['id']} done - Violations: {len(violations)}")
+        elif completed is False:
+            print(f"Job {job['id']} lease was lost; results discarded")
+        else:
+            print(f"Job {job['id']} results could not be reported; it will be retried after its lease expires")
+
+    def heartbeat_loop(self, job_id, stop):
+        while not stop.wait(self.heartbeat_interval):
+            try:
+                if not self.queue.heartbeat(job_id, self.worker_id):
+                    print(f"Job {job_id} lease lost")
+                    return
+            except Exception as e:
+                print(f"Error sending heartbeat for job {job_id}: {e}")
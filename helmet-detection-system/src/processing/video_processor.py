@@ -1,12 +1,17 @@
 import cv2
+import os
 import time
+from datetime import datetime
 from detection.vehicle_detector import VehicleDetector
 from utils.config import Config
+from utils.profiler import profile_stage
 
 class VideoProcessor:
-    def __init__(self, config):
+    def __init__(self, config, vehicle_detector=None, recorder=None, profiler=None):
         self.config = config
-        self.vehicle_detector = VehicleDetector(config)
+        self.vehicle_detector = vehicle_detector or VehicleDetector(config)
+        self.recorder = recorder
+        self.profiler = profiler
         self.frame_count = 0
     
     def process_video(self, input_path, output_path):
@@ -27,15 +32,16 @@ class VideoProcessor:
             print(f"Video properties: {width}x{height} at {fps} FPS")
             
             while True:
-                ret, frame = cap.read()
+                with profile_stage(self.profiler, 'decode'):
+                    ret, frame = cap.read()
                 if not ret:
                     break
                 
                 # Process every nth frame (for efficiency)
                 if self.frame_count % self.config.FRAME_SKIP == 0:
-                    processed_frame = self.process_frame(frame)
-                    out.write(processed_frame)
-                else:
+                    frame = self.process_frame(frame)
+                
+                with profile_stage(self.profiler, 'encode'):
                     out.write(frame)
                 
                 self.frame_count += 1
@@ -51,12 +57,63 @@ class VideoProcessor:
         except Exception as e:
             print(f"Error processing video: {e}")
     
+    def process_segment(self, input_path, start_frame=0, end_frame=None, camera_id=None):
+        """Run detection over a frame range without writing video and return the violations"""
+        cap = cv2.VideoCapture(input_path)
+        if not cap.isOpened():
+            raise IOError(f"Cannot open video: {input_path}")
+        
+        camera_id = camera_id or os.path.splitext(os.path.basename(input_path))[0]
+        if start_frame:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        
+        violations = []
+        frame_index = start_frame
+        try:
+            while end_frame is None or frame_index < end_frame:
+                with profile_stage(self.profiler, 'decode'):
+                    ret, frame = cap.read()
+                if not ret:
+                    break
+                
+                # Process every nth frame (for efficiency)
+                if frame_index % self.config.FRAME_SKIP == 0:
+                    with profile_stage(self.profiler, 'detect'):
+                        vehicles = self.vehicle_detector.detect_vehicles(frame)
+                    if self.recorder is not None:
+                        self.recorder.record(vehicles)
+                    violations.extend(self.find_violations(vehicles, frame_index, camera_id))
+                
+                frame_index += 1
+        finally:
+            cap.release()
+        
+        return violations
+    
+    def find_violations(self, vehicles, frame_index, camera_id):
+        """Flag two-wheelers as helmet violations until a helmet classifier is available"""
+        violations = []
+        for vehicle in vehicles:
+            if vehicle['class_name'] in ['motorcycle', 'bicycle']:
+                violations.append({
+                    'timestamp': datetime.now().strftime("%H:%M:%S"),
+                    'camera': camera_id,
+                    'frame': frame_index,
+                    'vehicle_type': vehicle['class_name'],
+                    'confidence': vehicle['confidence'],
+                    'plate_number': None,
+                    'bbox': vehicle['bbox']
+                })
+        
+        return violations
+    
     def process_camera(self, camera_index=0, output_path=None):
         """Process camera feed in real-time"""
         cap = cv2.VideoCapture(camera_index)
         
         while True:
-            ret, frame = cap.read()
+            with profile_stage(self.profiler, 'decode'):
+                ret, frame = cap.read()
             if not ret:
                 break
             
@@ -82,30 +139,40 @@ class VideoProcessor:
         """Process a single frame for vehicle and helmet detection"""
         try:
             # Detect vehicles
-            vehicles = self.vehicle_detector.detect_vehicles(frame)
+            with profile_stage(self.profiler, 'detect'):
+                vehicles = self.vehicle_detector.detect_vehicles(frame)
+            if self.recorder is not None:
+                self.recorder.record(vehicles)
             
             # Draw bounding boxes for detected vehicles
-            for vehicle in vehicles:
-                bbox = vehicle['bbox']
-                class_name = vehicle['class_name']
-                confidence = vehicle['confidence']
-                
-                # Choose color based on vehicle type
-                if class_name in ['motorcycle', 'bicycle']:
-                    color = self.config.BOX_COLORS['without_helmet']  # Red for two-wheelers
-                else:
-                    color = (255, 255, 255)  # White for other vehicles
-                
-                # Draw bounding box
-                cv2.rectangle(frame, (bbox[0], bbox[1]), (bbox[2], bbox[3]), color, 2)
-                
-                # Add label
-                label = f"{class_name} {confidence:.2f}"
-                cv2.putText(frame, label, (bbox[0], bbox[1] - 10), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+            with profile_stage(self.profiler, 'draw'):
+                self.draw_vehicles(frame, vehicles)
             
             return frame
             
         except Exception as e:
             print(f"Error processing frame: {e}")
-            return frame
\ No newline at end of file
+            return frame
+    
+    def draw_vehicles(self, frame, vehicles):
+        """Draw bounding boxes and labels for detected vehicles"""
+        for vehicle in vehicles:
+            bbox = vehicle['bbox']
+            class_name = vehicle['class_name']
+            confidence = vehicle['confidence']
+            
+            # Choose color based on vehicle type
+            if class_name in ['motorcycle', 'bicycle']:
+                color = self.config.BOX_COLORS['without_helmet']  # Red for two-wheelers
+            else:
+                color = (255, 255, 255)  # White for other vehicles
+            
+            # Draw bounding box
+            cv2.rectangle(frame, (bbox[0], bbox[1]), (bbox[2], bbox[3]), color, 2)
+            
+            # Add label
+            label = f"{class_name} {confidence:.2f}"
+            cv2.putText(frame, label, (bbox[0], bbox[1] - 10), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+        
+        return frame
\ No newline at end of file
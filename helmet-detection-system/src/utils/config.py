@@ -14,12 +14,30 @@ class Config:
     FRAME_SKIP = 5  # Process every 5th frame for efficiency
     OUTPUT_VIDEO_QUALITY = 70
     
+    # Still-image batch settings
+    IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+    IMAGE_BATCH_SIZE = 16
+    IMAGE_DECODE_THREADS = 4
+    IMAGE_REDUCE_FACTOR = 1  # 1, 2, 4 or 8 - decode JPEGs at reduced resolution
+    IMAGE_MANIFEST = "data/outputs/image_manifest.txt"
+    
+    # Distributed job queue settings
+    JOB_SEGMENT_FRAMES = 9000  # frames per job; 0 queues whole files
+    JOB_LEASE_SECONDS = 120
+    JOB_HEARTBEAT_INTERVAL = 30
+    JOB_POLL_INTERVAL = 5
+    JOB_MAX_ATTEMPTS = 3
+    JOB_MAX_BACKOFF = 60  # seconds between retries of a failing queue call
+    JOB_REPORT_ATTEMPTS = 5
+    
     # License plate settings
     LICENSE_PLATE_REGION = "en"  # Change based on your country
     
     # Output settings
     SAVE_VIOLATIONS = True
     OUTPUT_DIR = "data/outputs/"
+    ROLLUPS_DIR = "data/outputs/rollups"  # one file per writing process, merged by the dashboard
+    ROLLUPS_SAVE_INTERVAL = 5.0  # seconds between rollup writes
     
     # Visualization settings
     DRAW_BOUNDING_BOXES = True
@@ -0,0 +1,198 @@
+import os
+import sys
+import time
+import json
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+# Allocations made by the sampler thread itself land in these files
+PROFILER_FILES = {os.path.abspath(__file__), __file__, tracemalloc.__file__}
+
+def profile_stage(profiler, name):
+    """Return a stage context for profiler, or a no-op when profiling is off"""
+    if profiler is None:
+        return nullcontext()
+    return profiler.stage(name)
+
+class PipelineProfiler:
+    """Statistical CPU sampler plus tracemalloc snapshots, attributed to pipeline stages.
+
+    A background thread samples the pipeline thread's stack every
+    `interval` seconds, so the pipeline itself only pays for the stage
+    bookkeeping. Sampling stops on its own after `duration` seconds,
+    which keeps bursts in live runs cheap; stage timing stops with it so
+    every report covers the same window.
+    """
+
+    def __init__(self, output_dir, interval=0.005, snapshot_interval=5.0,
+                 duration=None, traceback_depth=1, top_allocations=25):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.snapshot_interval = snapshot_interval
+        self.duration = duration
+        self.traceback_depth = traceback_depth
+        self.top_allocations = top_allocations
+
+        self.stacks = Counter()
+        self.stage_stats = {}
+        self.allocation_growth = Counter()
+        self.allocation_blocks = Counter()
+        self.stage_path = []
+        self.target_thread = None
+        self.sampler = None
+        self.running = threading.Event()
+        self.started_at = None
+        self.ended_at = None
+        self.owns_tracemalloc = False
+
+    def start(self):
+        """Start sampling the calling thread"""
+        self.target_thread = threading.get_ident()
+        self.started_at = time.perf_counter()
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.traceback_depth)
+            self.owns_tracemalloc = True
+
+        self.running.set()
+        self.sampler = threading.Thread(target=self.sample_loop, name='pipeline-profiler', daemon=True)
+        self.sampler.start()
+        print(f"Profiling enabled (sampling every {self.interval * 1000:.1f} ms)")
+
+    def stop(self):
+        """Stop sampling and write the profile files"""
+        if self.started_at is None:
+            return
+
+        self.running.clear()
+        if self.sampler is not None:
+            self.sampler.join()
+            self.sampler = None
+        if self.ended_at is None:
+            self.ended_at = time.perf_counter()
+
+        self.write_reports()
+
+    @contextmanager
+    def stage(self, name):
+        """Attribute samples, time and allocations inside the block to `name`"""
+        # Outside the profiled window stages cost nothing and are not counted
+        if not self.running.is_set():
+            yield
+            return
+
+        self.stage_path.append(name)
+        start = time.perf_counter()
+        mem_before = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            # A burst may run out mid-stage; only count the part inside the window
+            if self.ended_at is not None:
+                end = min(end, self.ended_at)
+            elapsed = max(0.0, end - start)
+            mem_after = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else mem_before
+            self.stage_path.pop()
+
+            stats = self.stage_stats.setdefault(name, {'calls': 0, 'seconds': 0.0, 'net_bytes': 0})
+            stats['calls'] += 1
+            stats['seconds'] += elapsed
+            stats['net_bytes'] += mem_after - mem_before
+
+    def sample_loop(self):
+        """Background thread: collect stack samples and periodic allocation snapshots"""
+        last_snapshot = None
+        last_snapshot_time = time.perf_counter()
+
+        while self.running.is_set():
+            now = time.perf_counter()
+            if self.duration is not None and now - self.started_at > self.duration:
+                self.ended_at = now
+                self.running.clear()
+                print(f"Profiling burst finished after {self.duration:.0f}s")
+                break
+
+            self.take_sample()
+
+            if now - last_snapshot_time >= self.snapshot_interval:
+                last_snapshot = self.take_snapshot(last_snapshot)
+                last_snapshot_time = now
+
+            time.sleep(self.interval)
+
+        # Capture whatever grew since the last periodic snapshot
+        if tracemalloc.is_tracing():
+            self.take_snapshot(last_snapshot)
+            if self.owns_tracemalloc:
+                tracemalloc.stop()
+
+    def take_sample(self):
+        frame = sys._current_frames().get(self.target_thread)
+        if frame is None:
+            return
+
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        stack.reverse()
+
+        # Stage names become the root frames so flamegraphs group by stage
+        stages = [f"[{name}]" for name in list(self.stage_path)] or ['[unstaged]']
+        self.stacks[';'.join(stages + stack)] += 1
+
+    def take_snapshot(self, previous):
+        """Record allocation growth by source line since the previous snapshot.
+
+        A snapshot window spans many stages, so growth is not labelled with
+        a stage here; per-stage memory comes from the stage() boundaries.
+        """
+        snapshot = tracemalloc.take_snapshot()
+
+        if previous is not None:
+            for stat in snapshot.compare_to(previous, 'lineno'):
+                if stat.size_diff <= 0:
+                    continue
+                frame = stat.traceback[0]
+                # Skip the profiler's own bookkeeping
+                if frame.filename in PROFILER_FILES:
+                    continue
+                location = f"{frame.filename}:{frame.lineno}"
+                self.allocation_growth[location] += stat.size_diff
+                self.allocation_blocks[location] += stat.count_diff
+
+        return snapshot
+
+    def write_reports(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        # Collapsed stacks, readable by flamegraph.pl and speedscope
+        stacks_path = os.path.join(self.output_dir, 'cpu.collapsed')
+        with open(stacks_path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        # Stage timings, stack samples and allocations all cover this window
+        window_seconds = self.ended_at - self.started_at
+        stages_path = os.path.join(self.output_dir, 'stages.json')
+        with open(stages_path, 'w') as f:
+            json.dump({'window_seconds': window_seconds, 'stages': self.stage_stats}, f, indent=2)
+
+        summary_path = os.path.join(self.output_dir, 'allocations.txt')
+        with open(summary_path, 'w') as f:
+            f.write(f"PIPELINE STAGES (profiled window {window_seconds:.2f}s)\n")
+            for name, stats in sorted(self.stage_stats.items(), key=lambda item: -item[1]['seconds']):
+                avg_ms = stats['seconds'] * 1000 / max(stats['calls'], 1)
+                f.write(f"{name:<20} calls={stats['calls']:<8} total={stats['seconds']:.2f}s "
+                        f"avg={avg_ms:.2f}ms net_alloc={stats['net_bytes'] / 1024:.1f} KiB\n")
+
+            f.write("\nTOP ALLOCATION GROWTH\n")
+            for location, size in self.allocation_growth.most_common(self.top_allocations):
+                blocks = self.allocation_blocks[location]
+                f.write(f"{location} +{size / 1024:.1f} KiB ({blocks:+d} blocks)\n")
+
+        print(f"Profile written: {stacks_path}, {summary_path}")
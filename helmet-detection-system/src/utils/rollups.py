@@ -0,0 +1,296 @@
+import os
+import json
+import heapq
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+# Bucket key format and number of buckets kept for each granularity
+GRANULARITIES = {
+    'minute': ('%Y-%m-%dT%H:%M', 180),
+    'hour': ('%Y-%m-%dT%H', 24 * 14),
+    'day': ('%Y-%m-%d', 365),
+}
+DIMENSIONS = ('camera', 'vehicle_type', 'confidence_band')
+
+# Per-plate counts are kept for the most recently seen plates only
+MAX_TRACKED_PLATES = 50000
+TOP_OFFENDERS = 10
+
+# The plate log is rewritten from the plate table once it grows past this many
+# times MAX_TRACKED_PLATES lines
+PLATE_LOG_COMPACT_RATIO = 2
+
+def confidence_band(confidence):
+    """Bucket a confidence score into a 0.1-wide band such as '0.7-0.8'"""
+    lower = min(int(confidence * 10), 9) / 10
+    return f"{lower:.1f}-{lower + 0.1:.1f}"
+
+def writer_path(directory, writer_name):
+    """Rollups file for one writing process; concurrent writers must use different names"""
+    safe_name = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in writer_name)
+    return os.path.join(directory, f"{safe_name}.json")
+
+def plate_log_path(path):
+    """Append-only plate sightings that go with the rollups file at path"""
+    return os.path.splitext(path)[0] + '.plates'
+
+def empty_bucket():
+    return {'total': 0, **{dimension: {} for dimension in DIMENSIONS}}
+
+class ViolationRollups:
+    """Time-bucketed violation counts, updated in O(1) per recorded violation.
+
+    Each granularity keeps a bounded, chronologically ordered window of
+    buckets, and the top repeat offenders are maintained as violations
+    arrive, so any dashboard query is bounded regardless of how many
+    violations have been recorded.
+
+    Each writer owns two files: a small summary (buckets, totals and top
+    offenders) that is rewritten on every save, and an append-only log of
+    plate sightings that only the writer reads back when it restarts. The
+    dashboard combines the summaries of all writers.
+    """
+
+    def __init__(self, path=None, save_interval=5.0):
+        self.path = path
+        self.save_interval = save_interval
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.saver = None
+        self.stopping = threading.Event()
+
+        self.totals = empty_bucket()
+        self.buckets = {name: OrderedDict() for name in GRANULARITIES}
+        self.plates = OrderedDict()  # least recently seen first
+        self.top = {}
+        self.repeat_offenders = 0
+        self.pending_plates = {}  # sightings not yet in the plate log
+        self.plate_log_lines = 0
+
+    @classmethod
+    def load(cls, path, save_interval=5.0, with_plates=True):
+        """Load rollups from path, starting empty if the file does not exist yet.
+
+        Readers that only need the summary pass with_plates=False.
+        """
+        rollups = cls(path, save_interval)
+        if not os.path.exists(path):
+            return rollups
+
+        with open(path, 'r') as f:
+            data = json.load(f)
+
+        rollups.totals = data['totals']
+        rollups.buckets = {name: OrderedDict(data['buckets'].get(name, [])) for name in GRANULARITIES}
+        rollups.top = data['top']
+        rollups.repeat_offenders = data['repeat_offenders']
+        if with_plates:
+            rollups.load_plate_log()
+        return rollups
+
+    def load_plate_log(self):
+        """Rebuild the plate table, and with it the top offenders, from the plate log"""
+        self.plates = OrderedDict()
+        self.top = {}
+        self.repeat_offenders = 0
+        self.plate_log_lines = 0
+
+        try:
+            f = open(plate_log_path(self.path), 'r')
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                plate, _, count = line.rstrip('\n').partition('\t')
+                # A crash mid-append can leave a partial last line
+                if plate and count.isdigit():
+                    self.record_plate(plate, int(count))
+                    self.plate_log_lines += 1
+
+    @classmethod
+    def combine(cls, parts):
+        """Merge the summaries of several writers into one read-only view.
+
+        Only each writer's top offenders are merged, so repeat offenders
+        are counted per writer: a plate seen once by each of two cameras
+        is not a repeat offender.
+        """
+        combined = cls()
+        top = {}
+        for part in parts:
+            combined.add_counts(combined.totals, part.totals)
+            for name in GRANULARITIES:
+                buckets = combined.buckets[name]
+                for key, bucket in part.buckets[name].items():
+                    combined.add_counts(buckets.setdefault(key, empty_bucket()), bucket)
+            for plate, count in part.top.items():
+                top[plate] = top.get(plate, 0) + count
+            combined.repeat_offenders += part.repeat_offenders
+
+        # Writers cover different periods, so re-sort and re-trim the windows
+        for name, (_, retention) in GRANULARITIES.items():
+            ordered = sorted(combined.buckets[name].items())[-retention:]
+            combined.buckets[name] = OrderedDict(ordered)
+
+        combined.top = dict(heapq.nlargest(TOP_OFFENDERS, top.items(), key=lambda item: item[1]))
+        return combined
+
+    def add_counts(self, target, source):
+        target['total'] += source['total']
+        for dimension in DIMENSIONS:
+            counts = target[dimension]
+            for value, count in source[dimension].items():
+                counts[value] = counts.get(value, 0) + count
+
+    def record(self, violation, when=None):
+        """Fold a single violation into every rollup"""
+        when = when or datetime.now()
+        values = {
+            'camera': violation.get('camera', 'default'),
+            'vehicle_type': violation['vehicle_type'],
+            'confidence_band': confidence_band(violation['confidence']),
+        }
+        keys = [(name, when.strftime(key_format), retention)
+                for name, (key_format, retention) in GRANULARITIES.items()]
+        # Plates become log lines, so they must not contain separators
+        plate = ' '.join(str(violation.get('plate_number') or '').split())
+
+        with self.lock:
+            self.add_to_bucket(self.totals, values)
+            for name, key, retention in keys:
+                buckets = self.buckets[name]
+                if key not in buckets:
+                    buckets[key] = empty_bucket()
+                    # Drop the oldest buckets once the window is full
+                    while len(buckets) > retention:
+                        buckets.popitem(last=False)
+                self.add_to_bucket(buckets[key], values)
+
+            if plate:
+                self.record_plate(plate)
+                # Re-insert to keep the log in the order plates were last seen
+                self.pending_plates[plate] = self.pending_plates.pop(plate, 0) + 1
+
+            self.dirty = True
+
+    def record_plate(self, plate, sightings=1):
+        # Re-insert so the plate becomes the most recently seen
+        previous = self.plates.pop(plate, 0)
+        count = previous + sightings
+        self.plates[plate] = count
+        if previous < 2 <= count:
+            self.repeat_offenders += 1
+
+        # Keep the top offenders current; TOP_OFFENDERS is small and fixed
+        if count > 1:
+            if plate in self.top or len(self.top) < TOP_OFFENDERS:
+                self.top[plate] = count
+            else:
+                lowest = min(self.top, key=self.top.get)
+                if count > self.top[lowest]:
+                    del self.top[lowest]
+                    self.top[plate] = count
+
+        while len(self.plates) > MAX_TRACKED_PLATES:
+            self.evict_plate()
+
+    def evict_plate(self):
+        """Forget the least recently seen plate that is not a top offender"""
+        for plate in self.plates:
+            if plate not in self.top:
+                break
+        if self.plates.pop(plate) > 1:
+            self.repeat_offenders -= 1
+
+    def add_to_bucket(self, bucket, values):
+        bucket['total'] += 1
+        for dimension, value in values.items():
+            counts = bucket[dimension]
+            counts[value] = counts.get(value, 0) + 1
+
+    def series(self, granularity, limit=None):
+        """Return the most recent buckets of a granularity, oldest first"""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+
+        buckets = list(self.buckets[granularity].items())
+        if limit is not None:
+            if limit < 1:
+                raise ValueError(f"limit must be at least 1, got {limit}")
+            buckets = buckets[-limit:]
+        return [{'bucket': key, **bucket} for key, bucket in buckets]
+
+    def top_offenders(self, limit=TOP_OFFENDERS):
+        """Return the most frequent repeat offenders, most frequent first"""
+        offenders = sorted(self.top.items(), key=lambda item: -item[1])
+        return [{'plate': plate, 'count': count} for plate, count in offenders[:limit]]
+
+    def start(self):
+        """Save pending changes every save_interval on a background thread"""
+        if self.path is None or self.saver is not None:
+            return
+        self.stopping.clear()
+        self.saver = threading.Thread(target=self.save_loop, name='rollups-saver', daemon=True)
+        self.saver.start()
+
+    def stop(self):
+        """Stop the background saver and write any pending changes"""
+        if self.saver is not None:
+            self.stopping.set()
+            self.saver.join()
+            self.saver = None
+        if self.dirty:
+            self.save()
+
+    def save_loop(self):
+        while not self.stopping.wait(self.save_interval):
+            if self.dirty:
+                try:
+                    self.save()
+                except OSError as e:
+                    print(f"Error saving rollups: {e}")
+
+    def save(self):
+        """Append new plate sightings, then rewrite the summary atomically"""
+        if self.path is None:
+            return
+
+        # Only the small summary is encoded while recording is blocked
+        with self.lock:
+            summary = json.dumps({
+                'totals': self.totals,
+                'buckets': {name: list(buckets.items()) for name, buckets in self.buckets.items()},
+                'top': self.top,
+                'repeat_offenders': self.repeat_offenders,
+                'updated': datetime.now().isoformat()
+            })
+            pending, self.pending_plates = self.pending_plates, {}
+            self.plate_log_lines += len(pending)
+            compact = self.plate_log_lines > PLATE_LOG_COMPACT_RATIO * MAX_TRACKED_PLATES
+            if compact:
+                pending = dict(self.plates)
+                self.plate_log_lines = len(pending)
+            self.dirty = False
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # The plate log is written first so it is never behind the summary
+        log_path = plate_log_path(self.path)
+        lines = ''.join(f"{plate}\t{count}\n" for plate, count in pending.items())
+        if compact:
+            self.write_atomically(log_path, lines)
+        elif lines:
+            with open(log_path, 'a') as f:
+                f.write(lines)
+
+        self.write_atomically(self.path, summary)
+
+    def write_atomically(self, path, text):
+        """Write a file so readers never see a partial version"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
@@ -0,0 +1,72 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from detection.detection_trace import DetectionRecorder, ReplayDetector
+
+def make_frame(index):
+    """A frame with `index % 3` detections, with confidences that float32 cannot hold exactly"""
+    return [
+        {
+            'bbox': [index, n, index + 10, n + 10],
+            'confidence': 0.85 + index / 1000 + n / 10000,
+            'class_id': 3 if n % 2 else 1,
+            'class_name': 'motorcycle' if n % 2 else 'bicycle'
+        }
+        for n in range(index % 3)
+    ]
+
+def test_round_trip_across_flush_boundary(tmp_path):
+    trace_path = str(tmp_path / 'trace')
+    recorder = DetectionRecorder(trace_path, flush_frames=4)
+    frames = [make_frame(i) for i in range(10)]
+    for detections in frames:
+        recorder.record(detections)
+
+    # The leading 0 offset counts toward the threshold, so the first chunk
+    # is flushed after flush_frames - 1 frames
+    assert ReplayDetector(trace_path).frame_count == 7
+    recorder.save()
+
+    replay = ReplayDetector(trace_path)
+    assert replay.frame_count == 10
+    assert [replay.detect_vehicles() for _ in frames] == frames
+    assert replay.detect_vehicles() == []
+
+def test_read_while_recording(tmp_path):
+    trace_path = str(tmp_path / 'trace')
+    recorder = DetectionRecorder(trace_path, flush_frames=1000)
+    for i in range(5):
+        recorder.record(make_frame(i))
+    recorder.flush()
+
+    # Rows appended after the header was written are not visible
+    for i in range(5, 8):
+        recorder.record(make_frame(i))
+    replay = ReplayDetector(trace_path)
+    assert replay.detect_vehicles_batch([None] * 6) == [make_frame(i) for i in range(5)] + [[]]
+
+    recorder.save()
+    assert ReplayDetector(trace_path).frame_count == 8
+
+def test_empty_trace(tmp_path):
+    trace_path = str(tmp_path / 'trace')
+    DetectionRecorder(trace_path).save()
+
+    replay = ReplayDetector(trace_path, loop=True)
+    assert replay.frame_count == 0
+    assert replay.detect_objects(None) == []
+
+def test_loop_replays_from_start(tmp_path):
+    trace_path = str(tmp_path / 'trace')
+    recorder = DetectionRecorder(trace_path)
+    frames = [make_frame(i) for i in range(1, 4)]
+    for detections in frames:
+        recorder.record(detections)
+    recorder.save()
+
+    replay = ReplayDetector(trace_path, loop=True)
+    assert [replay.detect_vehicles() for _ in range(7)] == frames + frames + frames[:1]
+    replay.reset()
+    assert replay.detect_vehicles() == frames[0]
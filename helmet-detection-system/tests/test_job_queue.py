@@ -0,0 +1,161 @@
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from processing.job_queue import JobQueue, JobQueueServer, JobWorker, RemoteJobQueue
+
+VIOLATION = {
+    'frame': 0,
+    'camera': 'archive',
+    'vehicle_type': 'motorcycle',
+    'confidence': 0.9,
+    'plate_number': 'MH01AB1234',
+    'bbox': [1, 2, 3, 4]
+}
+
+class FakeProcessor:
+    def __init__(self, fail_starts=()):
+        self.fail_starts = set(fail_starts)
+        self.segments = []
+
+    def process_segment(self, video_path, start_frame, end_frame):
+        self.segments.append((video_path, start_frame, end_frame))
+        if start_frame in self.fail_starts:
+            raise IOError("cannot decode")
+        return [dict(VIOLATION, frame=start_frame)]
+
+def make_queue(tmp_path, **kwargs):
+    return JobQueue(str(tmp_path / 'jobs.db'), **kwargs)
+
+def test_enqueue_is_idempotent(tmp_path):
+    queue = make_queue(tmp_path)
+    first = queue.enqueue_segments('/videos/a.mp4', 100, 40)
+    second = queue.enqueue_segments('/videos/a.mp4', 100, 40)
+
+    assert len(first) == 3
+    assert second == []
+    assert queue.enqueue('/videos/a.mp4', 0, 40) is None
+    assert queue.status_counts() == {'queued': 3}
+
+def test_last_segment_is_open_ended(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue_segments('/videos/a.mp4', 100, 40)
+
+    ranges = []
+    while True:
+        job = queue.lease('w1')
+        if job is None:
+            break
+        ranges.append((job['start_frame'], job['end_frame']))
+    assert ranges == [(0, 40), (40, 80), (80, None)]
+
+def test_expired_lease_is_requeued(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.05)
+    job_id = queue.enqueue('/videos/a.mp4')
+    assert queue.lease('dead')['id'] == job_id
+
+    time.sleep(0.1)
+    assert queue.requeue_expired() == 1
+    assert queue.heartbeat(job_id, 'dead') is False
+    assert queue.lease('alive')['id'] == job_id
+
+def test_stale_complete_is_dropped(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.05)
+    job_id = queue.enqueue('/videos/a.mp4')
+    queue.lease('slow')
+    time.sleep(0.1)
+    queue.lease('fast')
+
+    assert queue.complete(job_id, 'slow', [VIOLATION]) is False
+    assert queue.complete(job_id, 'fast', [VIOLATION]) is True
+    # A retried complete from the owner does not store the results twice
+    assert queue.complete(job_id, 'fast', [VIOLATION]) is True
+    assert len(queue.violations(job_id)) == 1
+
+def test_job_fails_after_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    job_id = queue.enqueue('/videos/a.mp4')
+
+    queue.lease('w1')
+    assert queue.fail(job_id, 'w1', 'boom') is True
+    assert queue.status_counts() == {'queued': 1}
+
+    queue.lease('w1')
+    queue.fail(job_id, 'w1', 'boom')
+    assert queue.status_counts() == {'failed': 1}
+    assert queue.lease('w1') is None
+
+def test_worker_reports_into_queue(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=1)
+    queue.enqueue_segments('/videos/a.mp4', 90, 30)
+    processor = FakeProcessor(fail_starts={30})
+
+    worker = JobWorker(queue, processor, worker_id='w1', poll_interval=0.01)
+    worker.run(exit_when_idle=True)
+
+    assert worker.jobs_done == 2
+    assert queue.status_counts() == {'done': 2, 'failed': 1}
+    assert [v['frame'] for v in queue.violations()] == [0, 60]
+
+def test_violations_since_pages_by_id(tmp_path):
+    queue = make_queue(tmp_path)
+    for start in (0, 30, 60):
+        job_id = queue.enqueue('/videos/a.mp4', start, start + 30)
+        queue.lease('w1')
+        queue.complete(job_id, 'w1', [dict(VIOLATION, frame=start)])
+
+    first = queue.violations_since(0, 2)
+    assert [v['job_id'] for v in first] == [1, 2]
+    rest = queue.violations_since(first[-1]['id'], 2)
+    assert [v['job_id'] for v in rest] == [3]
+    assert rest[0]['plate_number'] == VIOLATION['plate_number']
+    assert queue.violations_since(rest[-1]['id']) == []
+
+class FlakyQueue:
+    """Raises like a locked database on the first call of each method"""
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.failed = set()
+
+    def __getattr__(self, name):
+        method = getattr(self.queue, name)
+
+        def call(*args):
+            if name not in self.failed:
+                self.failed.add(name)
+                raise RuntimeError("database is locked")
+            return method(*args)
+        return call
+
+def test_worker_retries_transient_queue_errors(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue('/videos/a.mp4')
+
+    worker = JobWorker(FlakyQueue(queue), FakeProcessor(), worker_id='w1',
+                       poll_interval=0.01, max_backoff=0.01)
+    worker.run(exit_when_idle=True)
+
+    assert worker.jobs_done == 1
+    assert queue.status_counts() == {'done': 1}
+
+def test_remote_queue_round_trip(tmp_path):
+    server = JobQueueServer(make_queue(tmp_path), ('127.0.0.1', 0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        remote = RemoteJobQueue(*server.server_address)
+        remote.enqueue_segments('/videos/a.mp4', 60, 30)
+
+        worker = JobWorker(remote, FakeProcessor(), worker_id='remote', poll_interval=0.01)
+        worker.run(exit_when_idle=True)
+
+        assert worker.jobs_done == 2
+        assert remote.status_counts() == {'done': 2}
+        assert len(remote.violations_since(0)) == 2
+        remote.close()
+    finally:
+        server.shutdown()
+        server.server_close()
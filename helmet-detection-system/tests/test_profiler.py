@@ -0,0 +1,29 @@
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.profiler import PipelineProfiler, profile_stage
+
+def test_stage_timing_stops_with_the_burst(tmp_path):
+    profiler = PipelineProfiler(str(tmp_path), interval=0.005, duration=0.2)
+    profiler.start()
+    deadline = time.perf_counter() + 0.5
+    while time.perf_counter() < deadline:
+        with profile_stage(profiler, 'detect'):
+            time.sleep(0.01)
+    profiler.stop()
+
+    with open(tmp_path / 'stages.json') as f:
+        stages = json.load(f)
+
+    window = stages['window_seconds']
+    assert 0.2 <= window < 0.3
+    assert stages['stages']['detect']['seconds'] <= window
+    assert stages['stages']['detect']['calls'] < 30
+
+def test_profile_stage_without_profiler():
+    with profile_stage(None, 'detect'):
+        pass
@@ -0,0 +1,147 @@
+import os
+import sys
+import time
+import pytest
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils import rollups as rollups_module
+from utils.rollups import ViolationRollups, confidence_band, writer_path
+
+def make_violation(plate, camera='cam1', vehicle_type='motorcycle', confidence=0.75):
+    return {
+        'camera': camera,
+        'vehicle_type': vehicle_type,
+        'confidence': confidence,
+        'plate_number': plate
+    }
+
+def test_confidence_band_clamps_top_band():
+    assert confidence_band(0.75) == '0.7-0.8'
+    assert confidence_band(1.0) == '0.9-1.0'
+
+def test_record_updates_buckets_and_totals():
+    rollups = ViolationRollups()
+    start = datetime(2026, 1, 1, 10, 0)
+    for minute in range(3):
+        rollups.record(make_violation('MH01', camera=f"cam{minute % 2}"), when=start + timedelta(minutes=minute))
+
+    assert rollups.totals['total'] == 3
+    assert rollups.totals['camera'] == {'cam0': 2, 'cam1': 1}
+    assert [b['bucket'] for b in rollups.series('minute')] == [
+        '2026-01-01T10:00', '2026-01-01T10:01', '2026-01-01T10:02'
+    ]
+    assert rollups.series('hour') == [{
+        'bucket': '2026-01-01T10', 'total': 3,
+        'camera': {'cam0': 2, 'cam1': 1},
+        'vehicle_type': {'motorcycle': 3},
+        'confidence_band': {'0.7-0.8': 3}
+    }]
+
+def test_series_limit():
+    rollups = ViolationRollups()
+    for hour in range(3):
+        rollups.record(make_violation('MH01'), when=datetime(2026, 1, 1, hour))
+
+    assert [b['bucket'] for b in rollups.series('hour', 1)] == ['2026-01-01T02']
+    assert len(rollups.series('hour')) == 3
+    with pytest.raises(ValueError):
+        rollups.series('hour', 0)
+
+def test_top_offenders_match_full_count():
+    rollups = ViolationRollups()
+    plates = [f"P{i % 37}" for i in range(500)] + ['P3'] * 20 + ['P5'] * 10
+    for plate in plates:
+        rollups.record(make_violation(plate))
+
+    counts = Counter(plates)
+    expected = sorted(counts.values(), reverse=True)[:rollups_module.TOP_OFFENDERS]
+    assert [o['count'] for o in rollups.top_offenders()] == expected
+    assert rollups.top_offenders()[0] == {'plate': 'P3', 'count': counts['P3']}
+    assert rollups.repeat_offenders == len(counts)
+
+def test_plate_tracking_is_capped(monkeypatch):
+    monkeypatch.setattr(rollups_module, 'MAX_TRACKED_PLATES', 5)
+    rollups = ViolationRollups()
+    rollups.record(make_violation('TOP'))
+    rollups.record(make_violation('TOP'))
+    for i in range(20):
+        rollups.record(make_violation(f"ONCE{i}"))
+
+    assert len(rollups.plates) == 5
+    # Top offenders are never evicted
+    assert rollups.plates['TOP'] == 2
+    assert rollups.top_offenders() == [{'plate': 'TOP', 'count': 2}]
+
+def test_combine_merges_writer_summaries(tmp_path):
+    when = datetime(2026, 1, 1, 10, 0)
+    first = ViolationRollups(writer_path(str(tmp_path), 'camera-a'))
+    second = ViolationRollups(writer_path(str(tmp_path), 'camera-b'))
+    for plate in ('MH01', 'MH01', 'KA02'):
+        first.record(make_violation(plate, camera='a'), when=when)
+    second.record(make_violation('MH01', camera='b'), when=when)
+    second.record(make_violation('MH01', camera='b'), when=when + timedelta(days=1))
+    second.record(make_violation('KA02', camera='b'), when=when + timedelta(days=1))
+    first.save()
+    second.save()
+
+    combined = ViolationRollups.combine([
+        ViolationRollups.load(writer_path(str(tmp_path), 'camera-a'), with_plates=False),
+        ViolationRollups.load(writer_path(str(tmp_path), 'camera-b'), with_plates=False),
+    ])
+
+    assert combined.totals['total'] == 6
+    assert combined.totals['camera'] == {'a': 3, 'b': 3}
+    assert [b['bucket'] for b in combined.series('day')] == ['2026-01-01', '2026-01-02']
+    # Repeat offenders are counted per writer: KA02 was seen once by each camera
+    assert combined.repeat_offenders == 2
+    assert combined.top_offenders() == [{'plate': 'MH01', 'count': 4}]
+
+def test_plates_stay_out_of_the_summary(tmp_path):
+    path = writer_path(str(tmp_path), 'camera-a')
+    rollups = ViolationRollups(path)
+    for plate in ('MH01', 'KA02', 'MH01'):
+        rollups.record(make_violation(plate))
+    rollups.save()
+    rollups.record(make_violation('GJ03'))
+    rollups.save()
+
+    # Only top offenders appear in the summary
+    with open(path) as f:
+        assert 'GJ03' not in f.read()
+    with open(rollups_module.plate_log_path(path)) as f:
+        assert f.read() == "KA02\t1\nMH01\t2\nGJ03\t1\n"
+
+    # A restarted writer rebuilds its plate table from the log
+    restored = ViolationRollups.load(path)
+    assert restored.plates == rollups.plates
+    assert restored.top_offenders() == rollups.top_offenders()
+    assert restored.repeat_offenders == 1
+
+def test_plate_log_is_compacted(tmp_path, monkeypatch):
+    monkeypatch.setattr(rollups_module, 'MAX_TRACKED_PLATES', 5)
+    path = writer_path(str(tmp_path), 'camera-a')
+    rollups = ViolationRollups(path)
+    for i in range(30):
+        rollups.record(make_violation(f"P{i % 3}"))
+        rollups.save()
+
+    with open(rollups_module.plate_log_path(path)) as f:
+        assert len(f.readlines()) <= 2 * 5
+    assert ViolationRollups.load(path).plates == rollups.plates
+
+def test_background_saver(tmp_path):
+    path = writer_path(str(tmp_path), 'camera-a')
+    rollups = ViolationRollups(path, save_interval=0.01)
+    rollups.start()
+    rollups.record(make_violation('MH01'))
+    deadline = time.monotonic() + 2
+    while not os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert ViolationRollups.load(path, with_plates=False).totals['total'] == 1
+
+    rollups.record(make_violation('MH01'))
+    rollups.stop()
+    assert ViolationRollups.load(path).top_offenders() == [{'plate': 'MH01', 'count': 2}]
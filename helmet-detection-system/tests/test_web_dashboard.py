@@ -0,0 +1,157 @@
+import os
+import sys
+import json
+import threading
+import http.client
+from datetime import datetime
+from functools import partial
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import web_dashboard
+from web_dashboard import DashboardHandler, QueueRollups, RollupsCache, ThumbnailCache, ThreadingHTTPServer
+from processing.job_queue import JobQueue
+from utils.config import Config
+from utils.rollups import ViolationRollups, writer_path
+
+CLIP = bytes(range(100))
+
+class Dashboard:
+    """Dashboard server on a free port, serving a temporary outputs directory"""
+
+    def __init__(self, directory):
+        handler = partial(DashboardHandler, directory=str(directory))
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def request(self, path, method='GET', headers=None):
+        conn = http.client.HTTPConnection(*self.server.server_address)
+        try:
+            conn.request(method, path, headers=headers or {})
+            response = conn.getresponse()
+            return response, response.read()
+        finally:
+            conn.close()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def make_dashboard(tmp_path):
+    (tmp_path / 'violation_MH01_clip.mp4').write_bytes(CLIP)
+    (tmp_path / '.thumbnails').mkdir()
+    (tmp_path / '.thumbnails' / 'secret.jpg').write_bytes(b'x')
+    (tmp_path.parent / 'outside.txt').write_bytes(b'x')
+    return Dashboard(tmp_path)
+
+def test_byte_ranges(tmp_path):
+    dashboard = make_dashboard(tmp_path)
+    try:
+        path = '/evidence/violation_MH01_clip.mp4'
+        cases = {'bytes=10-19': (10, 19), 'bytes=-5': (95, 99), 'bytes=90-': (90, 99)}
+        for header, (start, end) in cases.items():
+            response, body = dashboard.request(path, headers={'Range': header})
+            assert response.status == 206
+            assert response.getheader('Content-Range') == f"bytes {start}-{end}/100"
+            assert body == CLIP[start:end + 1]
+
+        response, body = dashboard.request(path)
+        assert response.status == 200
+        assert response.getheader('Accept-Ranges') == 'bytes'
+        assert body == CLIP
+    finally:
+        dashboard.close()
+
+def test_unsatisfiable_range(tmp_path):
+    dashboard = make_dashboard(tmp_path)
+    try:
+        for header in ('bytes=100-', 'bytes=50-10', 'bytes=0-1,5-6', 'lines=0-1'):
+            response, body = dashboard.request('/evidence/violation_MH01_clip.mp4', headers={'Range': header})
+            assert response.status == 416
+            assert response.getheader('Content-Range') == 'bytes */100'
+            assert body == b''
+    finally:
+        dashboard.close()
+
+def test_not_modified_and_head(tmp_path):
+    dashboard = make_dashboard(tmp_path)
+    try:
+        path = '/evidence/violation_MH01_clip.mp4'
+        response, _ = dashboard.request(path)
+        etag = response.getheader('ETag')
+
+        response, body = dashboard.request(path, headers={'If-None-Match': etag})
+        assert response.status == 304
+        assert response.getheader('ETag') == etag
+        assert body == b''
+
+        response, body = dashboard.request(path, method='HEAD')
+        assert response.status == 200
+        assert response.getheader('Content-Length') == str(len(CLIP))
+        assert response.getheader('ETag') == etag
+        assert body == b''
+    finally:
+        dashboard.close()
+
+def test_rejects_paths_outside_evidence(tmp_path):
+    dashboard = make_dashboard(tmp_path)
+    try:
+        for path in ('/evidence/..%2Foutside.txt', '/evidence/../outside.txt',
+                     '/evidence/.thumbnails%2Fsecret.jpg', '/evidence/.thumbnails',
+                     '/evidence/', '/evidence/missing.jpg'):
+            for method in ('GET', 'HEAD'):
+                response, _ = dashboard.request(path, method=method)
+                assert response.status == 404, (method, path)
+    finally:
+        dashboard.close()
+
+def test_new_thumbnail_replaces_stale_ones(tmp_path):
+    thumb_dir = tmp_path / web_dashboard.THUMBNAIL_DIR
+    thumb_dir.mkdir()
+    for name in ('a.jpg.1-10-t.jpg', 'a.jpg.2-10-t.jpg', 'ab.jpg.1-10-t.jpg', 'a.jpg.x.jpg.1-10-t.jpg'):
+        (thumb_dir / name).write_bytes(b'old')
+
+    ThumbnailCache().store(str(thumb_dir / 'a.jpg.3-10-t.jpg'), b'new')
+
+    assert sorted(os.listdir(thumb_dir)) == ['a.jpg.3-10-t.jpg', 'a.jpg.x.jpg.1-10-t.jpg', 'ab.jpg.1-10-t.jpg']
+    assert (thumb_dir / 'a.jpg.3-10-t.jpg').read_bytes() == b'new'
+
+def test_stats_rejects_invalid_limits(tmp_path, monkeypatch):
+    rollups_dir = tmp_path / 'rollups'
+    rollups = ViolationRollups(writer_path(str(rollups_dir), 'camera-a'))
+    for hour in range(3):
+        rollups.record({'vehicle_type': 'motorcycle', 'confidence': 0.8}, when=datetime(2026, 1, 1, hour))
+    rollups.save()
+    monkeypatch.setattr(web_dashboard, 'rollups_cache', RollupsCache(str(rollups_dir)))
+
+    dashboard = make_dashboard(tmp_path)
+    try:
+        for limit in ('0', '-1', 'abc'):
+            response, _ = dashboard.request(f"/stats?limit={limit}")
+            assert response.status == 400, limit
+
+        response, body = dashboard.request('/stats?granularity=hour&limit=2')
+        assert response.status == 200
+        assert [b['bucket'] for b in json.loads(body)['series']] == ['2026-01-01T01', '2026-01-01T02']
+    finally:
+        dashboard.close()
+
+def test_rollups_dir_follows_config():
+    assert web_dashboard.rollups_cache.rollups_dir == os.path.abspath(Config.ROLLUPS_DIR)
+
+def test_stats_include_job_queue_results(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'))
+    violation = {'camera': 'archive', 'vehicle_type': 'motorcycle', 'confidence': 0.9, 'plate_number': 'MH01'}
+    cache = RollupsCache(str(tmp_path / 'rollups'), QueueRollups(queue, refresh_interval=0))
+
+    job_id = queue.enqueue('/videos/a.mp4')
+    queue.lease('w1')
+    queue.complete(job_id, 'w1', [violation, violation])
+    assert cache.get().totals['camera'] == {'archive': 2}
+
+    job_id = queue.enqueue('/videos/b.mp4')
+    queue.lease('w2')
+    queue.complete(job_id, 'w2', [violation])
+    rollups = cache.get()
+    assert rollups.totals['total'] == 3
+    assert rollups.top_offenders() == [{'plate': 'MH01', 'count': 3}]
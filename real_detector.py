@@ -3,30 +3,53 @@
 Real helmet detection system using YOLO
 """
 
+import argparse
 import cv2
-import torch
 import numpy as np
-from ultralytics import YOLO
 import os
+import sys
 from datetime import datetime
 
+# Shared modules live in the package source tree
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'helmet-detection-system', 'src'))
+
+from detection.detection_trace import DetectionRecorder, ReplayDetector
+from utils.profiler import PipelineProfiler, profile_stage
+from utils.rollups import ViolationRollups, writer_path
+from utils.config import Config
+
 class RealHelmetDetector:
-    def __init__(self):
+    def __init__(self, backend=None, recorder=None, profiler=None, camera_id='default'):
         self.vehicle_model = None
         self.helmet_model = None
+        self.backend = backend
+        self.recorder = recorder
+        self.profiler = profiler
+        self.camera_id = camera_id
         self.violations = []
         
         # Create directories
         os.makedirs('data/outputs', exist_ok=True)
         os.makedirs('data/samples', exist_ok=True)
         
-        self.load_models()
+        # Dashboard statistics, updated as violations are recorded. Each
+        # camera writes its own file so concurrent runs never overwrite
+        # each other; run one process per camera id.
+        rollups_path = writer_path(Config.ROLLUPS_DIR, f"camera-{self.camera_id}")
+        self.rollups = ViolationRollups.load(rollups_path, Config.ROLLUPS_SAVE_INTERVAL)
+        
+        # A replay backend stands in for the models entirely
+        if self.backend is None:
+            self.load_models()
     
     def load_models(self):
         """Load YOLO models for vehicle and helmet detection"""
         try:
             print("Loading YOLO models...")
             
+            # Imported lazily so replay runs never pull in torch
+            from ultralytics import YOLO
+            
             # Load pre-trained YOLOv8 models
             # These will be automatically downloaded if not present
             self.vehicle_model = YOLO('yolov8n.pt')  # For vehicle detection
@@ -40,6 +63,9 @@ class RealHelmetDetector:
     
     def detect_objects(self, frame):
         """Detect vehicles and people in the frame"""
+        if self.backend is not None:
+            return self.backend.detect_objects(frame)
+        
         if self.vehicle_model is None:
             return self.mock_detection(frame)
         
@@ -108,6 +134,7 @@ class RealHelmetDetector:
                 if not has_helmet:
                     violation = {
                         'timestamp': datetime.now().strftime("%H:%M:%S"),
+                        'camera': self.camera_id,
                         'vehicle_type': detection['class_name'],
                         'confidence': detection['confidence'],
                         'plate_number': self.generate_mock_plate(),
@@ -192,25 +219,37 @@ class RealHelmetDetector:
             frame_count = 0
             print("Starting detection...")
             
+            # Statistics are saved on a background thread, not per frame
+            self.rollups.start()
+            
             while True:
-                ret, frame = cap.read()
+                with profile_stage(self.profiler, 'decode'):
+                    ret, frame = cap.read()
                 if not ret:
                     break
                 
                 # Detect objects
-                detections = self.detect_objects(frame)
+                with profile_stage(self.profiler, 'detect'):
+                    detections = self.detect_objects(frame)
+                if self.recorder is not None:
+                    self.recorder.record(detections)
                 
                 # Check for helmet violations
-                violations = self.check_helmet_violation(detections)
+                with profile_stage(self.profiler, 'check_violations'):
+                    violations = self.check_helmet_violation(detections)
                 
                 # Add violations to global list
                 self.violations.extend(violations)
+                for violation in violations:
+                    self.rollups.record(violation)
                 
                 # Draw detections on frame
-                processed_frame = self.draw_detections(frame, detections, violations)
+                with profile_stage(self.profiler, 'draw'):
+                    processed_frame = self.draw_detections(frame, detections, violations)
                 
                 # Write frame
-                out.write(processed_frame)
+                with profile_stage(self.profiler, 'encode'):
+                    out.write(processed_frame)
                 
                 frame_count += 1
                 
@@ -219,12 +258,15 @@ class RealHelmetDetector:
                     print(f"📊 Processed {frame_count} frames - Violations: {len(violations)}")
                 
                 # Save violation screenshots
-                for violation in violations:
-                    self.save_violation_screenshot(frame, violation)
+                with profile_stage(self.profiler, 'screenshots'):
+                    for violation in violations:
+                        self.save_violation_screenshot(frame, violation)
             
             cap.release()
             out.release()
             
+            self.rollups.stop()
+            
             print(f"✅ Processing complete!")
             print(f"📁 Output saved: {output_path}")
             print(f"⚠️  Total violations detected: {len(self.violations)}")
@@ -301,6 +343,43 @@ DETAILED VIOLATIONS:
         print(f"✅ Sample video created: {output_path}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Real Helmet Detection System')
+    parser.add_argument('--input', type=str, default='data/samples/sample.mp4',
+                       help='Input video file path')
+    parser.add_argument('--output', type=str, default='data/outputs/result.mp4',
+                       help='Output video file path')
+    parser.add_argument('--camera-id', type=str, default=None,
+                       help='Camera name used in violation statistics (default: input file name)')
+    parser.add_argument('--record', type=str, default=None,
+                       help='Save per-frame detections to this trace directory')
+    parser.add_argument('--replay', type=str, default=None,
+                       help='Replay detections from a trace directory instead of running the model')
+    parser.add_argument('--profile', type=str, default=None,
+                       help='Write per-stage CPU and allocation profiles to this directory')
+    parser.add_argument('--profile-seconds', type=float, default=None,
+                       help='Stop profiling after this many seconds (default: whole run)')
+    args = parser.parse_args()
+    
     print("🚀 Starting Real Helmet Detection System...")
-    detector = RealHelmetDetector()
-    detector.process_video()
\ No newline at end of file
+    backend = ReplayDetector(args.replay) if args.replay else None
+    recorder = DetectionRecorder(args.record) if args.record else None
+    profiler = PipelineProfiler(args.profile, duration=args.profile_seconds) if args.profile else None
+    
+    camera_id = args.camera_id or os.path.splitext(os.path.basename(args.input))[0]
+    
+    detector = RealHelmetDetector(backend=backend, recorder=recorder, profiler=profiler,
+                                  camera_id=camera_id)
+    
+    # Start profiling after the models are loaded; always keep trace and profile
+    try:
+        if profiler is not None:
+            profiler.start()
+        detector.process_video(args.input, args.output)
+    except KeyboardInterrupt:
+        print("\nProcessing interrupted by user")
+    finally:
+        detector.rollups.stop()
+        if recorder is not None:
+            recorder.save()
+        if profiler is not None:
+            profiler.stop()
\ No newline at end of file
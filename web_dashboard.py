@@ -3,28 +3,402 @@
 Simple web dashboard to view helmet detection results
 """
 
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs, unquote
 import os
 import json
+import mimetypes
+import sys
+import time
+import argparse
+import threading
 from datetime import datetime
 
+# Shared modules live in the package source tree
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'helmet-detection-system', 'src'))
+
+from utils.config import Config
+from utils.rollups import ViolationRollups, GRANULARITIES, DIMENSIONS
+from processing.job_queue import open_queue
+
+# Evidence serving settings
+THUMBNAIL_WIDTH = 240
+THUMBNAIL_QUALITY = 70
+THUMBNAIL_CACHE_SIZE = 512  # thumbnails kept in memory
+THUMBNAIL_DIR = '.thumbnails'
+EVIDENCE_MAX_AGE = 86400
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Statistics settings
+STATS_DEFAULT_BUCKETS = 60
+QUEUE_REFRESH_INTERVAL = 5.0  # seconds between reads of new job queue results
+QUEUE_READ_BATCH = 1000
+
+class ThumbnailCache:
+    """Lazily generated thumbnails, cached on disk and in an in-memory LRU"""
+    
+    def __init__(self, capacity=THUMBNAIL_CACHE_SIZE):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, source_path, etag):
+        """Return JPEG thumbnail bytes for source_path, or None if it cannot be decoded"""
+        # The ETag alone is not unique: equal-size files can share an mtime
+        key = (source_path, etag)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        
+        data = self.load_or_create(source_path, etag)
+        if data is None:
+            return None
+        
+        with self.lock:
+            self.entries[key] = data
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+        
+        return data
+    
+    def load_or_create(self, source_path, etag):
+        """Read the thumbnail from the disk cache, generating it on a miss"""
+        thumb_dir = os.path.join(os.path.dirname(source_path), THUMBNAIL_DIR)
+        thumb_name = os.path.basename(source_path) + '.' + etag.strip('"') + '.jpg'
+        thumb_path = os.path.join(thumb_dir, thumb_name)
+        
+        if os.path.exists(thumb_path):
+            with open(thumb_path, 'rb') as f:
+                return f.read()
+        
+        # OpenCV is only needed for thumbnails, not for serving data and evidence
+        import cv2
+        
+        # Let the JPEG decoder downscale large evidence images while decoding
+        image = cv2.imread(source_path, cv2.IMREAD_REDUCED_COLOR_2)
+        if image is None:
+            return None
+        
+        height, width = image.shape[:2]
+        if width > THUMBNAIL_WIDTH:
+            thumb_height = max(1, height * THUMBNAIL_WIDTH // width)
+            image = cv2.resize(image, (THUMBNAIL_WIDTH, thumb_height), interpolation=cv2.INTER_AREA)
+        
+        ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, THUMBNAIL_QUALITY])
+        if not ok:
+            return None
+        data = encoded.tobytes()
+        self.store(thumb_path, data)
+        return data
+    
+    def store(self, thumb_path, data):
+        """Write a thumbnail and remove the ones made from earlier versions of its source"""
+        # Write atomically so concurrent requests never read a partial file
+        thumb_dir, thumb_name = os.path.split(thumb_path)
+        os.makedirs(thumb_dir, exist_ok=True)
+        tmp_path = f"{thumb_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, thumb_path)
+        
+        # Thumbnails are named <source name>.<etag>.jpg and the ETag has no dots
+        prefix = thumb_name[:thumb_name.rindex('.', 0, -len('.jpg')) + 1]
+        with os.scandir(thumb_dir) as entries:
+            stale = [entry.path for entry in entries
+                     if entry.name != thumb_name and entry.name.startswith(prefix)
+                     and entry.name.endswith('.jpg') and '.' not in entry.name[len(prefix):-len('.jpg')]]
+        for path in stale:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # already removed by a concurrent request
+
+class EvidenceIndex:
+    """Maps plate numbers to violation screenshots, rescanning only when the directory changes"""
+    
+    def __init__(self):
+        self.directory_mtime = None
+        self.by_plate = {}
+        self.lock = threading.Lock()
+    
+    def snapshot(self, directory):
+        """Return the current plate -> file name mapping; call once per request"""
+        with self.lock:
+            mtime = os.stat(directory).st_mtime_ns
+            if mtime != self.directory_mtime:
+                self.by_plate = self.scan(directory)
+                self.directory_mtime = mtime
+            return self.by_plate
+    
+    def scan(self, directory):
+        by_plate = {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                # Screenshots are named violation_<plate>_<YYYYmmdd>_<HHMMSS>.jpg
+                name = entry.name
+                if name.startswith('violation_') and name.endswith('.jpg'):
+                    plate = name[len('violation_'):].split('_', 1)[0]
+                    by_plate.setdefault(plate, name)
+        return by_plate
+
+class QueueRollups:
+    """Rollups of the violations that job queue workers reported, reading only new rows"""
+    
+    def __init__(self, queue, refresh_interval=QUEUE_REFRESH_INTERVAL):
+        self.queue = queue
+        self.refresh_interval = refresh_interval
+        self.rollups = ViolationRollups()
+        self.last_id = 0
+        self.last_refresh = None
+    
+    def refresh(self):
+        """Fold in violations reported since the last refresh; returns True if there were any"""
+        now = time.monotonic()
+        if self.last_refresh is not None and now - self.last_refresh < self.refresh_interval:
+            return False
+        self.last_refresh = now
+        
+        added = False
+        try:
+            while True:
+                rows = self.queue.violations_since(self.last_id, QUEUE_READ_BATCH)
+                for row in rows:
+                    self.rollups.record(row, when=datetime.fromtimestamp(row['recorded']))
+                    self.last_id = row['id']
+                added = added or bool(rows)
+                if len(rows) < QUEUE_READ_BATCH:
+                    break
+        except Exception as e:
+            # The queue may live on another host; keep serving what we have
+            print(f"Error reading job queue results: {e}")
+        return added
+
+class RollupsCache:
+    """Combines the rollups summaries of all writers, reloading only files that changed.
+    
+    Results of archive jobs are read from the job queue itself, so workers
+    on any host show up in the statistics.
+    """
+    
+    def __init__(self, rollups_dir, queue_rollups=None):
+        self.rollups_dir = rollups_dir
+        self.queue_rollups = queue_rollups
+        self.files = {}  # file name -> (mtime, ViolationRollups)
+        self.rollups = ViolationRollups()
+        self.lock = threading.Lock()
+    
+    def get(self):
+        with self.lock:
+            queue_changed = self.queue_rollups is not None and self.queue_rollups.refresh()
+            try:
+                with os.scandir(self.rollups_dir) as entries:
+                    mtimes = {entry.name: entry.stat().st_mtime_ns
+                              for entry in entries if entry.name.endswith('.json')}
+            except OSError:
+                mtimes = {}
+            
+            if not queue_changed and mtimes == {name: mtime for name, (mtime, _) in self.files.items()}:
+                return self.rollups
+            
+            files = {}
+            for name, mtime in mtimes.items():
+                cached = self.files.get(name)
+                if cached is not None and cached[0] == mtime:
+                    files[name] = cached
+                else:
+                    files[name] = (mtime, ViolationRollups.load(os.path.join(self.rollups_dir, name), with_plates=False))
+            
+            self.files = files
+            parts = [rollups for _, rollups in files.values()]
+            if self.queue_rollups is not None:
+                parts.append(self.queue_rollups.rollups)
+            self.rollups = ViolationRollups.combine(parts)
+            return self.rollups
+
+thumbnail_cache = ThumbnailCache()
+evidence_index = EvidenceIndex()
+# Resolved at import time, before the server changes into the outputs directory
+rollups_cache = RollupsCache(os.path.abspath(Config.ROLLUPS_DIR))
+
 class DashboardHandler(SimpleHTTPRequestHandler):
+    def do_HEAD(self):
+        url = urlsplit(self.path)
+        if url.path.startswith('/evidence/'):
+            self.send_evidence(unquote(url.path[len('/evidence/'):]), parse_qs(url.query), head_only=True)
+        else:
+            super().do_HEAD()
+    
     def do_GET(self):
-        if self.path == '/data':
+        url = urlsplit(self.path)
+        if url.path == '/data':
             self.send_dashboard_data()
+        elif url.path == '/stats':
+            self.send_stats(parse_qs(url.query))
+        elif url.path.startswith('/evidence/'):
+            self.send_evidence(unquote(url.path[len('/evidence/'):]), parse_qs(url.query))
         else:
             super().do_GET()
     
+    def send_evidence(self, name, query, head_only=False):
+        """Serve a violation image or clip, or its thumbnail with ?thumb=1"""
+        # Only plain file names inside the served directory are allowed
+        if not name or name != os.path.basename(name) or name.startswith('.'):
+            self.send_error(404)
+            return
+        
+        path = os.path.join(self.directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.send_error(404)
+            return
+        
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        thumb = query.get('thumb', ['0'])[0] == '1'
+        if thumb:
+            etag = etag[:-1] + '-t"'
+        
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_caching_headers(etag)
+            self.end_headers()
+            return
+        
+        if thumb:
+            data = thumbnail_cache.get(path, etag)
+            if data is None:
+                self.send_error(415, "Cannot create thumbnail")
+                return
+            self.send_response(200)
+            self.send_header('Content-type', 'image/jpeg')
+            self.send_header('Content-Length', str(len(data)))
+            self.send_caching_headers(etag)
+            self.end_headers()
+            if not head_only:
+                self.wfile.write(data)
+            return
+        
+        self.send_file_range(path, stat.st_size, etag, head_only)
+    
+    def send_file_range(self, path, size, etag, head_only=False):
+        """Send a file, honouring a single-range Range header for clip seeking"""
+        start, end = 0, size - 1
+        status = 200
+        
+        range_header = self.headers.get('Range')
+        if range_header and size > 0:
+            byte_range = self.parse_range(range_header, size)
+            if byte_range is None:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            start, end = byte_range
+            status = 206
+        
+        length = max(0, end - start + 1)
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        
+        self.send_response(status)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(length))
+        self.send_header('Accept-Ranges', 'bytes')
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.send_caching_headers(etag)
+        self.end_headers()
+        if head_only:
+            return
+        
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+    
+    def parse_range(self, header, size):
+        """Parse 'bytes=a-b', 'bytes=a-' or 'bytes=-n'; return (start, end) or None"""
+        units, _, spec = header.partition('=')
+        if units.strip() != 'bytes' or ',' in spec:
+            return None
+        
+        first, _, last = spec.strip().partition('-')
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else size - 1
+            else:
+                start = size - int(last)
+                end = size - 1
+        except ValueError:
+            return None
+        
+        start = max(0, start)
+        end = min(end, size - 1)
+        if start > end:
+            return None
+        return start, end
+    
+    def send_caching_headers(self, etag):
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', f'public, max-age={EVIDENCE_MAX_AGE}')
+    
+    def send_stats(self, query):
+        """Send time-bucketed violation statistics as JSON"""
+        granularity = query.get('granularity', ['hour'])[0]
+        if granularity not in GRANULARITIES:
+            self.send_error(400, f"granularity must be one of {', '.join(GRANULARITIES)}")
+            return
+        try:
+            limit = int(query.get('limit', [STATS_DEFAULT_BUCKETS])[0])
+        except ValueError:
+            limit = None
+        if limit is None or limit < 1:
+            self.send_error(400, "limit must be a positive integer")
+            return
+        
+        rollups = rollups_cache.get()
+        data = {
+            'granularity': granularity,
+            'dimensions': list(DIMENSIONS),
+            'totals': rollups.totals,
+            'series': rollups.series(granularity, limit),
+            'repeat_offenders': rollups.repeat_offenders,
+            'top_offenders': rollups.top_offenders(),
+            'last_updated': datetime.now().isoformat()
+        }
+        self.send_json(data)
+    
+    def send_json(self, data):
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+    
     def send_dashboard_data(self):
         """Send violation data as JSON"""
         violations = []
         
         # Read violation report if exists
-        report_path = "data/outputs/violation_report.txt"
+        report_path = os.path.join(self.directory, "violation_report.txt")
         if os.path.exists(report_path):
             with open(report_path, 'r') as f:
                 content = f.read()
                 
+            # One directory check per request, not per violation
+            evidence_by_plate = evidence_index.snapshot(self.directory)
+            
             # Parse violations from report (simplified)
             lines = content.split('\n')
             current_violation = {}
@@ -36,6 +410,9 @@ class DashboardHandler(SimpleHTTPRequestHandler):
                 elif 'Vehicle:' in line:
                     current_violation['vehicle'] = line.split('Vehicle:')[-1].strip()
                     if current_violation:
+                        evidence = evidence_by_plate.get(current_violation.get('plate'))
+                        if evidence:
+                            current_violation['image'] = f"/evidence/{evidence}"
                         violations.append(current_violation.copy())
                         current_violation = {}
         
@@ -45,11 +422,7 @@ class DashboardHandler(SimpleHTTPRequestHandler):
             'last_updated': datetime.now().isoformat()
         }
         
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        self.send_json(data)
 
 def create_dashboard_html():
     """Create a simple HTML dashboard"""
@@ -64,6 +437,14 @@ def create_dashboard_html():
         .violation { border: 1px solid #ddd; padding: 15px; margin: 10px 0; border-radius: 5px; }
         .count { font-size: 2em; color: #e74c3c; font-weight: bold; }
         .plate { background: #f39c12; color: white; padding: 2px 8px; border-radius: 3px; }
+        .stats { display: flex; gap: 20px; flex-wrap: wrap; margin: 20px 0; }
+        .panel { border: 1px solid #ddd; padding: 15px; border-radius: 5px; flex: 1; min-width: 250px; }
+        .chart { display: flex; align-items: flex-end; height: 150px; gap: 2px; }
+        .chart .bar { background: #e74c3c; flex: 1; min-width: 3px; }
+        .breakdown div { display: flex; align-items: center; margin: 4px 0; }
+        .breakdown .label { width: 110px; }
+        .breakdown .bar { background: #3498db; height: 14px; margin-right: 6px; }
+        .violation img { width: 120px; margin-right: 15px; vertical-align: middle; border-radius: 3px; }
     </style>
 </head>
 <body>
@@ -74,6 +455,27 @@ def create_dashboard_html():
     
     <div id="dashboard">
         <h2>Total Violations Detected: <span id="totalCount" class="count">0</span></h2>
+        
+        <div class="stats">
+            <div class="panel">
+                <h3>Violations per
+                    <select id="granularity" onchange="loadStats()">
+                        <option value="minute">minute</option>
+                        <option value="hour" selected>hour</option>
+                        <option value="day">day</option>
+                    </select>
+                </h3>
+                <div id="timeChart" class="chart"></div>
+            </div>
+            <div class="panel"><h3>By camera</h3><div id="camera" class="breakdown"></div></div>
+            <div class="panel"><h3>By vehicle type</h3><div id="vehicle_type" class="breakdown"></div></div>
+            <div class="panel"><h3>By confidence</h3><div id="confidence_band" class="breakdown"></div></div>
+            <div class="panel">
+                <h3>Repeat offenders: <span id="repeatCount">0</span></h3>
+                <div id="offenders" class="breakdown"></div>
+            </div>
+        </div>
+        
         <div id="violationsList"></div>
     </div>
 
@@ -86,26 +488,66 @@ def create_dashboard_html():
                 document.getElementById('totalCount').textContent = data.total_violations;
                 
                 const violationsList = document.getElementById('violationsList');
-                violationsList.innerHTML = '';
+                const fragment = document.createDocumentFragment();
                 
                 data.violations.forEach(violation => {
                     const div = document.createElement('div');
                     div.className = 'violation';
+                    const thumbnail = violation.image
+                        ? `<a href="${violation.image}" target="_blank"><img src="${violation.image}?thumb=1" loading="lazy" alt="Evidence"></a>`
+                        : '';
                     div.innerHTML = `
+                        ${thumbnail}
                         <strong>Time:</strong> ${violation.time} | 
                         <strong>Vehicle:</strong> ${violation.vehicle} | 
                         <strong>Plate:</strong> <span class="plate">${violation.plate}</span>
                     `;
-                    violationsList.appendChild(div);
+                    fragment.appendChild(div);
                 });
+                
+                violationsList.replaceChildren(fragment);
             } catch (error) {
                 console.error('Error loading data:', error);
             }
         }
         
+        function renderBreakdown(elementId, counts) {
+            const entries = Object.entries(counts).sort((a, b) => b[1] - a[1]);
+            const max = Math.max(1, ...entries.map(entry => entry[1]));
+            document.getElementById(elementId).innerHTML = entries.map(([label, count]) => `
+                <div><span class="label">${label}</span>
+                <span class="bar" style="width: ${120 * count / max}px"></span>${count}</div>
+            `).join('');
+        }
+        
+        async function loadStats() {
+            try {
+                const granularity = document.getElementById('granularity').value;
+                const response = await fetch(`/stats?granularity=${granularity}`);
+                const stats = await response.json();
+                
+                const max = Math.max(1, ...stats.series.map(bucket => bucket.total));
+                document.getElementById('timeChart').innerHTML = stats.series.map(bucket => `
+                    <div class="bar" style="height: ${100 * bucket.total / max}%"
+                         title="${bucket.bucket}: ${bucket.total}"></div>
+                `).join('');
+                
+                stats.dimensions.forEach(dimension => renderBreakdown(dimension, stats.totals[dimension]));
+                
+                document.getElementById('repeatCount').textContent = stats.repeat_offenders;
+                const offenders = {};
+                stats.top_offenders.forEach(offender => { offenders[offender.plate] = offender.count; });
+                renderBreakdown('offenders', offenders);
+            } catch (error) {
+                console.error('Error loading stats:', error);
+            }
+        }
+        
         // Load data every 5 seconds
         loadData();
+        loadStats();
         setInterval(loadData, 5000);
+        setInterval(loadStats, 5000);
     </script>
 </body>
 </html>
@@ -117,15 +559,27 @@ def create_dashboard_html():
     print("✅ Dashboard created: dashboard.html")
 
 if __name__ == "__main__":
-    # Create dashboard HTML
+    parser = argparse.ArgumentParser(description='Helmet detection dashboard')
+    parser.add_argument('--queue', type=str, default=None,
+                       help='Include results of archive jobs from this job queue (SQLite path or tcp://host:port)')
+    args = parser.parse_args()
+    
+    if args.queue:
+        # Opened before changing directory so relative queue paths still work
+        rollups_cache = RollupsCache(os.path.abspath(Config.ROLLUPS_DIR), QueueRollups(open_queue(args.queue)))
+    
+    # Serve from outputs directory
+    os.makedirs('data/outputs', exist_ok=True)
+    os.chdir('data/outputs')
+    
+    # Create dashboard HTML next to the evidence it links to
     create_dashboard_html()
     
     # Start web server
     port = 8080
-    os.chdir('data/outputs')  # Serve from outputs directory
     
     print(f"🌐 Starting dashboard server at http://localhost:{port}")
     print("📊 Open the URL above to view violations dashboard")
     
-    server = HTTPServer(('', port), DashboardHandler)
+    server = ThreadingHTTPServer(('', port), DashboardHandler)
     server.serve_forever()
\ No newline at end of file